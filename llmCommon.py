@@ -0,0 +1,25 @@
+from typing import Callable, Optional
+
+# Past exchanges resent with each request by every backend; every interact message
+# already carries the goal and recent commands, so older turns only add prompt tokens
+MAX_HISTORY_TURNS = 8
+
+
+def truncate_lines(text: str, max_lines: int) -> Optional[str]:
+    """Return `text` cut after `max_lines` complete non-empty lines, or None if not there yet."""
+    complete = text.split("\n")[:-1]
+    seen = 0
+    for i, line in enumerate(complete):
+        if line.strip():
+            seen += 1
+            if seen == max_lines:
+                return "\n".join(complete[:i + 1])
+    return None
+
+
+def emit_lines(text: str, emitted: int, on_line: Callable[[str], None], max_lines: Optional[int]) -> int:
+    """Pass complete non-empty lines of `text` past the first `emitted` to `on_line`; return the new count."""
+    lines = [line for line in text.split("\n")[:-1] if line.strip()][:max_lines]
+    for line in lines[emitted:]:
+        on_line(line)
+    return len(lines)
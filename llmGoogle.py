@@ -1,32 +1,184 @@
 import os
+import time
+import asyncio
+import itertools
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import httpx
 from google import genai
+from google.genai import types
 from dotenv import load_dotenv
+from llmCommon import MAX_HISTORY_TURNS, emit_lines, truncate_lines
 from pprint import pprint
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# System prompts are uploaded once as cached content and referenced by name
+CACHE_TTL_SECONDS = 3600
+
+
+class _ApiKey:
+    """A client for one API key, with its own request pacing and prompt caches."""
+
+    def __init__(self, api_key: Optional[str], requests_per_minute: int):
+        # One client per key for the whole process so every session reuses the same
+        # pooled, kept-alive connections instead of paying a TLS handshake per request
+        self.client = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                timeout=60000,
+                async_client_args={
+                    "limits": httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                },
+            ),
+        )
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        # system prompt -> (cache name or None if the prompt can't be cached, expiry time);
+        # caches belong to the key's project, so each key keeps its own
+        self.prompt_caches: Dict[str, Tuple[Optional[str], float]] = {}
+        # system prompt -> lock held while its cache is created, so concurrent
+        # sessions on a cold or expiring cache create one entry between them
+        self.prompt_cache_locks: Dict[str, asyncio.Lock] = {}
+
+    async def throttle(self):
+        """Wait for this key's next free slot under its requests-per-minute cap."""
+        if not self.interval:
+            return
+        now = time.monotonic()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_api_keys: Optional[List[_ApiKey]] = None
+_rotation: Optional[Iterator[_ApiKey]] = None
+
+
+def _get_api_keys() -> List[_ApiKey]:
+    """Build one client per key in GEMINI_API_KEYS (comma-separated), falling back to GEMINI_API_KEY."""
+    global _api_keys, _rotation
+    if _api_keys is None:
+        raw = os.getenv("GEMINI_API_KEYS") or os.getenv("GEMINI_API_KEY") or ""
+        keys = [key.strip() for key in raw.split(",") if key.strip()] or [None]
+        requests_per_minute = int(os.getenv("GEMINI_RPM_PER_KEY") or 0)
+        _api_keys = [_ApiKey(key, requests_per_minute) for key in keys]
+        _rotation = itertools.cycle(_api_keys)
+    return _api_keys
+
+
+def _next_api_key() -> _ApiKey:
+    """Round-robin over the configured keys so throughput scales with key count."""
+    _get_api_keys()
+    return next(_rotation)
+
+
+async def warmup():
+    """Open a pooled connection for every API key ahead of the first request."""
+    await asyncio.gather(*(api_key.client.aio.models.list() for api_key in _get_api_keys()))
+
+
+@lru_cache(maxsize=None)
+def _inline_config(system_prompt: str) -> types.GenerateContentConfig:
+    """Config sending the system prompt inline, built once per prompt and shared by every session using it."""
+    return types.GenerateContentConfig(system_instruction=system_prompt)
+
 
 class llm:
     def __init__(self, system_prompt: str):
-        # self.config = GenerateContentConfigOrDict(system_instruction = system_prompt)
         self.model = os.getenv("GEMINI_MODEL")
-        self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
         self.system_prompt = system_prompt
-        self.chat = self.client.chats.create(model=self.model)
-        self.chat.send_message(self.system_prompt)
-        
-    def generate_response(self, user_prompt: str):
+        self.config = _inline_config(system_prompt)
+        # Conversation is tracked here rather than in a genai chat so a stream
+        # can be cut short and calls can go through any API key
+        self.history: List[types.Content] = []
+
+    async def _get_config(self, api_key: _ApiKey) -> types.GenerateContentConfig:
+        """Reference the key's cached system prompt, creating or renewing it when needed."""
+        entry = api_key.prompt_caches.get(self.system_prompt)
+        # Renew a minute early so requests never reference an expired cache. The
+        # replaced cache is not deleted: requests already sent may still reference
+        # it, and its own TTL ends within that minute
+        if entry is None or entry[1] - 60 < time.time():
+            lock = api_key.prompt_cache_locks.setdefault(self.system_prompt, asyncio.Lock())
+            async with lock:
+                # Another session may have renewed it while this one waited
+                entry = api_key.prompt_caches.get(self.system_prompt)
+                if entry is None or entry[1] - 60 < time.time():
+                    try:
+                        cache = await api_key.client.aio.caches.create(
+                            model=self.model,
+                            config=types.CreateCachedContentConfig(
+                                system_instruction=self.system_prompt,
+                                ttl=f"{CACHE_TTL_SECONDS}s",
+                            ),
+                        )
+                        entry = (cache.name, time.time() + CACHE_TTL_SECONDS)
+                    except Exception as e:
+                        # Prompts under the model's minimum cacheable size are sent inline
+                        logger.warning(f"System prompt caching unavailable: {e}")
+                        entry = (None, time.time() + CACHE_TTL_SECONDS)
+                    api_key.prompt_caches[self.system_prompt] = entry
+
+        if entry[0] is None:
+            return self.config
+        return types.GenerateContentConfig(cached_content=entry[0])
+
+    async def generate_response(self, user_prompt: str, max_lines: Optional[int] = None,
+                                on_line: Optional[Callable[[str], None]] = None):
+        """
+        Stream a response from the model.
+
+        Args:
+            user_prompt: The user message to send
+            max_lines: Stop generation once this many non-empty lines have arrived
+            on_line: Called with each complete non-empty line while the response is still streaming
+
+        Returns:
+            The response text (only the consumed lines when max_lines is set)
+
+        Raises:
+            Provider errors propagate so callers can tell throttling from bad requests
+        """
+        api_key = _next_api_key()
+        await api_key.throttle()
+
+        user_content = types.Content(role="user", parts=[types.Part(text=user_prompt)])
+        stream = await api_key.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=self.history + [user_content],
+            config=await self._get_config(api_key),
+        )
+
+        text = ""
+        emitted = 0
         try:
-            response = self.chat.send_message(user_prompt)
-            # print(f"Response: {response}")
-            return response.text
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
-        
+            async for chunk in stream:
+                text += chunk.text or ""
+                if on_line:
+                    emitted = emit_lines(text, emitted, on_line, max_lines)
+                if max_lines:
+                    truncated = truncate_lines(text, max_lines)
+                    if truncated is not None:
+                        text = truncated
+                        break
+        finally:
+            await stream.aclose()
+
+        self.history.append(user_content)
+        self.history.append(types.Content(role="model", parts=[types.Part(text=text)]))
+        # Drop whole turns so the history still starts with a user message
+        del self.history[:-2 * MAX_HISTORY_TURNS]
+        return text
+
 
 if __name__ == "__main__":
     system_prompt = "You are a helpful assistant."
     user_prompt = "What is the capital of France?"
-    
+
     llm_instance = llm(system_prompt)
-    response = llm_instance.generate_response(user_prompt)
+    response = asyncio.run(llm_instance.generate_response(user_prompt))
     print(response)
\ No newline at end of file
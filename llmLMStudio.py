@@ -1,45 +1,20 @@
-import os
-from openai import OpenAI
-from dotenv import load_dotenv
-from pprint import pprint
-load_dotenv()
+import asyncio
+import llmOpenAI
 
 
-class llm:
-    def __init__(self, system_prompt: str):
-        self.model = os.getenv("LMSTUDIO_MODEL")
-        self.client = OpenAI(api_key=os.getenv("LMSTUDIO_API_KEY"), base_url=os.getenv("LMSTUDIO_BASE_URL"))
-        self.system_prompt = system_prompt
-        self.messages = [{"role": "system", "content": self.system_prompt}]
-               
-    def generate_response(self, user_prompt: str):
-        try:
-            # Add user message
-            self.messages.append({"role": "user", "content": user_prompt})
-            
-            # Call the API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=self.messages,
-            )
-            
-            # Access response content as object attributes, not dictionary keys
-            assistant_message = response.choices[0].message.content
-            
-            # Add assistant response to message history
-            self.messages.append({"role": "assistant", "content": assistant_message})
-            
-            return assistant_message
-        
-        except Exception as e:
-            print(f"Full error details: {str(e)}")
-            return f"Error generating response: {str(e)}"
-        
+async def warmup():
+    """Open a pooled connection to the API ahead of the first request."""
+    await llmOpenAI.warmup("LMSTUDIO")
+
+
+class llm(llmOpenAI.OpenAICompatibleLLM):
+    ENV_PREFIX = "LMSTUDIO"
+
 
 if __name__ == "__main__":
     system_prompt = "You are a helpful assistant."
     user_prompt = "What is the capital of France?"
     
     llm_instance = llm(system_prompt)
-    response = llm_instance.generate_response(user_prompt)
-    print(response)
\ No newline at end of file
+    response = asyncio.run(llm_instance.generate_response(user_prompt))
+    print(response)
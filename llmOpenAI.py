@@ -0,0 +1,92 @@
+import os
+from collections import deque
+from typing import Callable, Optional
+import httpx
+from openai import AsyncOpenAI
+from dotenv import load_dotenv
+from llmCommon import MAX_HISTORY_TURNS, emit_lines, truncate_lines
+load_dotenv()
+
+# Shared by every llm instance so sessions reuse pooled, kept-alive connections
+# instead of paying a TLS handshake per request
+_http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    timeout=httpx.Timeout(60, connect=5),
+)
+
+
+def _client(env_prefix: str) -> AsyncOpenAI:
+    """Client for the API configured by <env_prefix>_API_KEY and <env_prefix>_BASE_URL."""
+    return AsyncOpenAI(
+        api_key=os.getenv(f"{env_prefix}_API_KEY"),
+        base_url=os.getenv(f"{env_prefix}_BASE_URL"),
+        http_client=_http_client,
+    )
+
+
+async def warmup(env_prefix: str):
+    """Open a pooled connection to the API ahead of the first request."""
+    await _client(env_prefix).models.list()
+
+
+class OpenAICompatibleLLM:
+    """Chat over an OpenAI-compatible API; subclasses set ENV_PREFIX to pick its settings."""
+
+    ENV_PREFIX = ""
+
+    def __init__(self, system_prompt: str):
+        self.model = os.getenv(f"{self.ENV_PREFIX}_MODEL")
+        self.client = _client(self.ENV_PREFIX)
+        self.system_prompt = system_prompt
+        self.system_message = {"role": "system", "content": self.system_prompt}
+        # Completed exchanges only; old turns fall off in O(1) as whole user/assistant pairs
+        self.history = deque(maxlen=2 * MAX_HISTORY_TURNS)
+
+    async def generate_response(self, user_prompt: str, max_lines: Optional[int] = None,
+                                on_line: Optional[Callable[[str], None]] = None):
+        """
+        Stream a response from the model.
+
+        Args:
+            user_prompt: The user message to send
+            max_lines: Stop generation once this many non-empty lines have arrived
+            on_line: Called with each complete non-empty line while the response is still streaming
+
+        Returns:
+            The response text (only the consumed lines when max_lines is set)
+
+        Raises:
+            Provider errors propagate so callers can tell throttling from bad requests
+        """
+        user_message = {"role": "user", "content": user_prompt}
+
+        # Call the API
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=(self.system_message, *self.history, user_message),
+            stream=True,
+        )
+
+        # Accumulate deltas, cutting the stream once enough lines are in
+        assistant_message = ""
+        emitted = 0
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                assistant_message += chunk.choices[0].delta.content
+                if on_line:
+                    emitted = emit_lines(assistant_message, emitted, on_line, max_lines)
+                if max_lines:
+                    truncated = truncate_lines(assistant_message, max_lines)
+                    if truncated is not None:
+                        assistant_message = truncated
+                        break
+        finally:
+            await stream.close()
+
+        # Record the exchange only once it completed
+        self.history.append(user_message)
+        self.history.append({"role": "assistant", "content": assistant_message})
+
+        return assistant_message
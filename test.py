@@ -1,27 +1,52 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext, CDPSession
 import uvicorn
-from llmGoogle import llm
+from llmGoogle import llm, warmup as warmup_llm
 import time
 import uuid
-import json
+import weakref
+import orjson
 import logging
-from typing import Dict, Optional, Any, List
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import queue
+from typing import Annotated, Awaitable, Callable, Dict, Iterator, Optional, Any, List, Tuple
+from urllib.parse import urlsplit
 from datetime import datetime, timedelta
 import asyncio
+import ast
+import inspect
+import hashlib
+import httpx
+import os
+import random
+import sys
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints
 from enum import Enum
+from functools import lru_cache
+
+# Configure logging; file and console writes happen on a listener thread so a log
+# call in a request handler never blocks the event loop on I/O
+os.makedirs('logs', exist_ok=True)
+_log_queue: queue.Queue = queue.Queue()
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler('logs/browser_automation.log'),
+    logging.StreamHandler()
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # Flush queued records on exit
 
-# Configure logging
+# Records are formatted by the QueueHandler, so the listener's handlers write them as-is
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/browser_automation.log'),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
@@ -29,13 +54,30 @@ logger = logging.getLogger(__name__)
 @dataclass
 class Config:
     MAX_RETRIES: int = 5
+    MAX_BACKOFF_SECONDS: float = 10.0  # Cap on the wait after a throttled or failed LLM call
     SESSION_TIMEOUT_MINUTES: int = 30
+    SESSION_CLEANUP_INTERVAL_SECONDS: int = 60
     PAGE_WAIT_TIMEOUT: int = 4000
-    HOST: str = "0.0.0.0"
-    PORT: int = 8000
+    ACTION_SETTLE_TIMEOUT: int = 1500  # Longest wait for the requests a click or select starts to finish
+    HOST: str = os.getenv("HOST", "0.0.0.0")
+    PORT: int = int(os.getenv("PORT", "8000"))
     HEADLESS: bool = False
     BROWSER_TIMEOUT: int = 15000
     USE_JAVASCRIPT_EXECUTION: bool = True  # Use JS execution instead of direct Playwright commands
+    CONTEXT_POOL_SIZE: int = 2  # Browser contexts kept warm for new sessions
+    # Every session holds one context, so this also caps sessions: when all are taken the
+    # least recently used idle session is evicted, and if every session is busy new ones
+    # wait up to CONTEXT_ACQUIRE_TIMEOUT_SECONDS before /start_session answers 503
+    MAX_BROWSER_CONTEXTS: int = 64
+    CONTEXT_ACQUIRE_TIMEOUT_SECONDS: float = 30.0
+    REUSE_STORAGE_STATE: bool = os.getenv("REUSE_STORAGE_STATE", "").lower() in ("1", "true")  # Reuse a tester's logins across their sessions
+    STORAGE_STATE_DIR: str = "states"
+    PLAYWRIGHT_STACK_TRACES: bool = os.getenv("PW_INSPECT_STACK", "0") == "1"  # Per-call stack capture; only for debugging
+    PAGE_SNAPSHOT_MAX_CHARS: int = 3000  # Element list kept per session and sent to the LLM
+    MAX_PAGE_ELEMENTS: int = 50  # Interactive elements listed per page snapshot
+    COMMAND_HISTORY_SIZE: int = 50  # Executed commands kept per session and returned by /interact
+    MAX_UNCHANGED_SNAPSHOTS: int = 2  # Repeated element lists sent as a note in a row; keep below the LLM history turns
+    MAX_BATCHED_COMMANDS: int = 3  # JSON commands accepted per LLM response (matches JAVASCRIPT_INTERACT_PROMPT)
 
 config = Config()
 
@@ -50,12 +92,18 @@ class ModeEnum(str, Enum):
 
 class StartSessionRequest(BaseModel):
     """Request model for starting a new session."""
-    mode: ModeEnum = Field(default=ModeEnum.INTERACT, description="Automation mode to use")
+    model_config = ConfigDict(use_enum_values=True)
     
-    class Config:
-        use_enum_values = True
+    mode: ModeEnum = Field(default=ModeEnum.INTERACT, description="Automation mode to use")
+    storage_key: Optional[str] = Field(
+        default=None, max_length=200,
+        description="Tester whose saved logins are restored and updated when REUSE_STORAGE_STATE is on; omit to start clean"
+    )
 
 
+# Response models are built with model_construct: the endpoints fill them from
+# server-side state, so validating on construction only repeats the checks FastAPI's
+# response_model serialization makes anyway
 class StartSessionResponse(BaseModel):
     """Response model for session creation."""
     session_id: str = Field(..., description="Unique session identifier")
@@ -65,13 +113,10 @@ class StartSessionResponse(BaseModel):
 
 class InteractRequest(BaseModel):
     """Request model for browser interaction commands."""
-    message: str = Field(..., min_length=1, max_length=5000, description="Natural language command to execute")
-    
-    @validator('message')
-    def validate_message(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Message cannot be empty or whitespace only')
-        return v.strip()
+    # Stripping runs before the length checks, so whitespace-only messages are rejected
+    message: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1, max_length=5000)] = Field(
+        ..., description="Natural language command to execute"
+    )
 
 
 class CommandExecuted(BaseModel):
@@ -85,7 +130,7 @@ class InteractResponse(BaseModel):
     """Response model for browser interaction."""
     status: str = Field(..., description="Status of the operation: success, failure, or partial")
     session_id: str = Field(..., description="The session identifier")
-    commands_executed: List[str] = Field(default_factory=list, description="List of commands executed")
+    commands_executed: List[str] = Field(default_factory=list, description="Most recent commands executed in the session (up to COMMAND_HISTORY_SIZE)")
     error: Optional[str] = Field(None, description="Error message if status is failure")
     code: int = Field(..., description="HTTP-like status code")
     execution_time_seconds: Optional[float] = Field(None, description="Total execution time")
@@ -109,253 +154,30 @@ class SessionStatusResponse(BaseModel):
     last_activity: Optional[datetime] = Field(None, description="Last activity time")
 
 
-INTERACT_SYSTEM_PROMPT = """
-    *`*Role**  
-    You are an expert UI tester working in Playwright Python. Your task is to generate commands for the active browser tab.
-
-    **Input Format**  
-    Natural language instruction (e.g., "Take screenshot of header after login").
-
-    **Output Rules**  
-    1. EXCLUSIVELY output a SINGLE async Playwright Python command using the existing `page` object followed by the next input command on a new line.
-    2. Format: `<command> \n <next_input>`
-    3. DO NOT USE MARKDOWN CODE BLOCKS. DO NOT USE TRIPLE BACKTICKS (```). Output raw commands only 1 step at a time.
-    4. No explanations, comments, or formatting symbols. Strictly follow the format.
-    5. ALWAYS start by navigating to the desired page using `await page.goto(<URL>)`.
-    6. Prioritize the following locator methods:
-        - role-based locators (e.g., `get_by_role`)
-        - text-based locators (e.g., `get_by_text`)
-    7. Ensure proper waits:
-        - `wait_for_timeout(2000)` for fixed delays
-        - `wait_for_load_state("networkidle")`
-        - `wait_for_selector()` with a 2s timeout
-    8. Chain related actions using:
-        - `.first()`
-        - `.nth(index)`
-        - `.filter()`
-    9. Check if elements exist before interacting:
-        - `if locator.count() > 0:`
-        - `if locator.is_visible():`
-        - `if locator.is_enabled():`
-    10. Replace `<variable_value>` with the actual value in the command.
-    11. If an input is involved, confirm that the field is filled before submitting.
-    12. If filling a field, ensure the field is visible before filling it. If a field is not visible, a click action might be needed to make it visible.
-
-    **Examples**
-
-    1. 
-    Input: "log in into https://practicetestautomation.com/practice-test-login/ with username student and password Password123"
-    Output: "await page.goto("https://practicetestautomation.com/practice-test-login/") \n Fill out the username field with 'student'."
-    
-    Input: "Fill out the username field with 'student'."
-    Output: "await page.get_by_role('textbox', name='Username').fill('student') \n Wait for the password field to be visible. If already visible, continue."
-    
-    Input: "Fill in the password field with Password123."
-    Output: "await page.get_by_role('textbox', name='Password').fill('Password123') \n Wait for the submit button to be enabled/ If already enabled, click on the submit/log in button."
-    
-    Input: "Wait for the submit button to be enabled/ If already enabled, click on the submit/log in button."
-    Output: "await page.get_by_role('button', name='Submit').click() \n print('#completed')"
-    
-    Input: "Set action_done to True."
-    Output: "print('#completed') \n Done."
-   
-    2.  
-    Input: "log in into reddit.com with username boogieman and password abcd1234 and navigate to popular"
-    Output: "await page.goto('https://reddit.com') \n Verify that the Reddit homepage has loaded."
-
-    Input: "Verify that the Reddit homepage has loaded."
-    Output: "await page.get_by_role('link', name='Log In').wait_for(timeout=5000) \n Locate the 'Log In' link."
-
-    Input: "Locate the 'Log In' link."
-    Output: "await page.get_by_role('link', name='Log In').click() \n Wait for the username field to become visible."
-
-    Input: "Wait for the username field to become visible."
-    Output: "await page.get_by_role('textbox', name='Username').wait_for(timeout=5000) \n Fill in the username field with 'boggiemann'."
-
-    Input: "Fill in the username field with 'boggiemann'."
-    Output: "await page.get_by_role('textbox', name='Username').fill('boggiemann') \n Wait for the password field to become visible."
-
-    Input: "Wait for the password field to become visible."
-    Output: "await page.get_by_role('textbox', name='Password').wait_for(timeout=5000) \n Fill in the password field with 'abcd1234'."
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
 
-    Input: "Fill in the password field with 'abcd1234'."
-    Output: "await page.get_by_role('textbox', name='Password').fill('abcd1234') \n Wait a moment before submitting."
 
-    Input: "Wait a moment before submitting."
-    Output: "await page.wait_for_timeout(1000) \n Click the 'Log In' button."
+def _load_prompt(name: str) -> str:
+    """Read a system prompt from the prompts directory."""
+    with open(os.path.join(PROMPTS_DIR, name), encoding="utf-8") as f:
+        return f.read()
 
-    Input: "Click the 'Log In' button."
-    Output: "await page.get_by_role('button', name='Log In').click() \n Wait a moment after submitting."
 
-    Input: "Wait a moment after submitting."
-    Output: "await page.wait_for_timeout(1000) \n Navigate to Popular."
-
-    Input: "Navigate to Popular."
-    Output: "await page.locator('a:has-text(\"Popular\")').click() \n Wait for the 'Popular' page to load."
-
-    Input: "Wait for the 'Popular' page to load."
-    Output: "await page.wait_for_load_state('networkidle') \n Set action_done to True."
-    
-    Input: "Set action_done to True."
-    Output: "print('#completed') \n Done."
-    """
-
-JAVASCRIPT_INTERACT_PROMPT = """
-    **Role**  
-    You are an expert browser automation assistant. You generate JavaScript-based browser interaction commands that are more reliable than traditional selectors.
-
-    **IMPORTANT: You will receive a list of ALL visible interactive elements on the page with their attributes (id, name, placeholder, text, etc.). Use this information to generate accurate commands!**
-
-    **Input Format**  
-    Natural language instruction + **Current Page Elements** list showing all visible inputs, buttons, links with their attributes.
-
-    **Output Rules**  
-    1. Output a SINGLE JSON command object followed by the next step description on a new line.
-    2. Format: `<JSON command> \\n <next_step_description>`
-    3. DO NOT USE MARKDOWN CODE BLOCKS. Output raw JSON only.
-    4. ALWAYS look at the "Current Page Elements" list to find the exact selectors available.
-    5. Each command must be a valid JSON object with these fields:
-       - "action": One of ["goto", "click", "fill", "select", "press_key", "wait", "wait_element", "switch_tab", "close_tab", "close_other_tabs", "completed"]
-       - "selector": Use EXACT values from the page elements list (id, name, placeholder, text, class)
-       - "selector_type": "css", "text", "placeholder", "label", "xpath"
-       - "value": Value for fill/select actions or URL for goto
-       - "timeout": Milliseconds for wait actions (default 2000)
-       - "tab_index": Tab number for switch_tab or close_tab actions (0-based index)
-    
-    6. When selecting elements:
-       - If you see placeholder="X" in the list, use selector_type="placeholder" and selector="X"
-       - If you see text="X" in the list, use selector_type="text" and selector="X"
-       - If you see id="X" in the list, use selector_type="css" and selector="#X"
-       - If you see name="X" in the list, use selector_type="css" and selector="[name='X']"
-    
-    7. About opening links in new tabs:
-       - If an element shows "⚠️ OPENS_IN_NEW_TAB (target=_blank)", it ALREADY opens in a new tab
-       - DO NOT add "open_in_new_tab": true for elements that already have this marker
-       - Only use "open_in_new_tab": true if you need a link to open in a new tab AND it doesn't have the marker
-    
-    8. About managing multiple tabs:
-       - You will see "**Open Tabs**" section if there are multiple tabs open
-       - Use "close_other_tabs" to close all tabs except the current one (RECOMMENDED when too many tabs are open)
-       - Use "switch_tab" with tab_index to switch to a specific tab
-       - Use "close_tab" without tab_index to close current tab, or with tab_index to close specific tab
-       - Tab indices are 0-based (first tab = 0, second tab = 1, etc.)
-    
-    9. About handling dropdowns:
-       - If an element shows "🔽 DROPDOWN" it's a select/dropdown element
-       - Elements with "🔽 DROPDOWN options=[...]" show available options
-       - Use "select" action for dropdowns, NOT "click" or "fill"
-       - For select action: use the OPTION TEXT as the value (e.g., "United States", "Blue", "Option 1")
-       - selector_type can be "css", "text", "label" to find the dropdown
-       - Example: {"action": "select", "selector": "Country", "selector_type": "label", "value": "United States"}
-    
-    **Command Examples:**
-    
-    Navigate:
-    {"action": "goto", "value": "https://example.com"}
-    
-    Click by CSS:
-    {"action": "click", "selector": "button.login-btn", "selector_type": "css"}
-    
-    Click by text (normal):
-    {"action": "click", "selector": "Sign in", "selector_type": "text"}
-    
-    Click link that ALREADY opens in new tab (don't add open_in_new_tab):
-    // Element list shows: [5] a - text="Documentation", ⚠️ OPENS_IN_NEW_TAB (target=_blank)
-    {"action": "click", "selector": "Documentation", "selector_type": "text"}
-    
-    Click link and force open in new tab (only if it doesn't already):
-    // Element list shows: [3] a - text="About", href="https://example.com/about"
-    {"action": "click", "selector": "About", "selector_type": "text", "open_in_new_tab": true}
-    
-    Fill by placeholder:
-    {"action": "fill", "selector": "Enter your email", "selector_type": "placeholder", "value": "user@example.com"}
-    
-    Fill by CSS:
-    {"action": "fill", "selector": "input[name='username']", "selector_type": "css", "value": "testuser"}
-    
-    Fill by label:
-    {"action": "fill", "selector": "Username", "selector_type": "label", "value": "testuser"}
-    
-    Select dropdown by label:
-    // Element list shows: [8] select - name="country", 🔽 DROPDOWN options=[United States, Canada, Mexico, ...]
-    {"action": "select", "selector": "country", "selector_type": "css", "value": "United States"}
-    
-    Select dropdown by CSS:
-    {"action": "select", "selector": "select[name='color']", "selector_type": "css", "value": "Blue"}
-    
-    Select custom dropdown by text:
-    // Element list shows: [12] div - role=combobox, aria-label="Select language", 🔽 DROPDOWN
-    {"action": "select", "selector": "Select language", "selector_type": "label", "value": "English"}
-    
-    Press key:
-    {"action": "press_key", "value": "Enter"}
-    
-    Wait for element:
-    {"action": "wait_element", "selector": "button.submit", "selector_type": "css", "timeout": 5000}
-    
-    General wait:
-    {"action": "wait", "timeout": 2000}
-    
-    Task completed:
-    {"action": "completed"}
-    
-    Switch to tab 0 (first tab):
-    {"action": "switch_tab", "tab_index": 0}
-    
-    Close current tab:
-    {"action": "close_tab"}
-    
-    Close specific tab (tab 2):
-    {"action": "close_tab", "tab_index": 2}
-    
-    Close all other tabs (keep only current):
-    {"action": "close_other_tabs"}
+INTERACT_SYSTEM_PROMPT = _load_prompt("interact.md")
 
-    **Full Example Flow:**
-    
-    Input: "Go to example.com and click the login button"
-    Output: {"action": "goto", "value": "https://example.com"} \\n Wait for page to load and locate login button
-    
-    Input: "Wait for page to load and locate login button"
-    Output: {"action": "wait_element", "selector": "Log in", "selector_type": "text", "timeout": 3000} \\n Click the login button
-    
-    Input: "Click the login button"
-    Output: {"action": "click", "selector": "Log in", "selector_type": "text"} \\n Wait for username field
-    
-    Input: "Wait for username field"
-    Output: {"action": "wait_element", "selector": "username", "selector_type": "placeholder", "timeout": 3000} \\n Fill username with provided value
-    
-    Input: "Fill username with 'testuser'"
-    Output: {"action": "fill", "selector": "username", "selector_type": "placeholder", "value": "testuser"} \\n Fill password field
-    
-    Input: "Fill password field with 'password123'"
-    Output: {"action": "fill", "selector": "password", "selector_type": "placeholder", "value": "password123"} \\n Submit the form
-    
-    Input: "Submit the form"
-    Output: {"action": "press_key", "value": "Enter"} \\n Wait for login to complete
-    
-    Input: "Wait for login to complete"
-    Output: {"action": "wait", "timeout": 2000} \\n Mark as completed
-    
-    Input: "Mark as completed"
-    Output: {"action": "completed"} \\n Done
-    
-    **Important Notes:**
-    - Always use the simplest and most reliable selector
-    - Prefer text-based selectors when possible (more robust than CSS)
-    - Add waits between major actions
-    - Use wait_element to ensure elements are present before interacting
-    - Mark task as completed when the goal is achieved
-    """
-    
+JAVASCRIPT_INTERACT_PROMPT = _load_prompt("js_interact.md")
 
 
 @dataclass
 class Session:
     """Represents a browser automation session."""
     page: Optional[Page] = None
-    commands_executed: List[str] = field(default_factory=list)
+    # Bounded so long-lived sessions don't grow without limit; the total keeps counts exact
+    commands_executed: deque = field(default_factory=lambda: deque(maxlen=config.COMMAND_HISTORY_SIZE))
+    commands_executed_total: int = 0
+    recent_commands: deque = field(default_factory=lambda: deque(maxlen=5))  # Tail of commands_executed shown to the LLM
     page_snapshot: str = ""
+    unchanged_snapshots: int = 0  # Steps in a row whose element list matched the one before
     retry_count: int = 0
     action_done: bool = False
     llm: Optional[llm] = None
@@ -364,41 +186,116 @@ class Session:
     last_activity: datetime = field(default_factory=datetime.now)
     use_javascript: bool = True  # Use JavaScript execution by default
     browser_context: Optional[Any] = None  # Browser context for managing multiple pages
+    storage_key: Optional[str] = None  # Whose saved logins this session restores and updates
     all_pages: List[Page] = field(default_factory=list)  # Track all open pages/tabs
+    tracked_pages: set = field(default_factory=set)  # Same pages as all_pages, for O(1) membership
+    popup_tasks: set = field(default_factory=set)  # Load watchers for new tabs, stopped on close
+    in_flight: int = 0  # /interact requests running on this session
+    closed: bool = False  # Set once close_session has started tearing it down
+    
+    def track_page(self, page: Page) -> bool:
+        """
+        Add a page to all_pages; it removes itself when it closes.
+        
+        Returns:
+            False if the page was already tracked
+        """
+        if page in self.tracked_pages:
+            return False
+        self.tracked_pages.add(page)
+        self.all_pages.append(page)
+        
+        def untrack(closed: Page):
+            if closed in self.tracked_pages:
+                self.tracked_pages.discard(closed)
+                self.all_pages.remove(closed)
+        
+        page.on("close", untrack)
+        return True
+    
+    def record_command(self, command: str):
+        """Log an executed command in the bounded history, the total count and the recent window."""
+        self.commands_executed.append(command)
+        self.commands_executed_total += 1
+        self.recent_commands.append(command)
 
 
 class SessionManager:
     """Manages browser sessions with automatic cleanup."""
     
     def __init__(self):
-        self.sessions: Dict[str, Session] = {}
+        # Ordered by last use so the least recently used session is first. Every
+        # mutation happens between awaits on the event loop, so no lock is needed
+        self.sessions: OrderedDict[str, Session] = OrderedDict()
         self._cleanup_task: Optional[asyncio.Task] = None
 
-    def create_session(self) -> str:
-        """Create a new browser session."""
+    async def create_session(self, storage_key: Optional[str] = None) -> str:
+        """
+        Create a new browser session holding its own browser context.
+        
+        Args:
+            storage_key: Tester whose saved storage state is preloaded, if reuse is on
+        
+        When every context is taken, the least recently used idle session is evicted
+        to free one; busy sessions are left alone, so the pool's wait applies instead.
+        
+        Raises:
+            asyncio.TimeoutError: No context freed up within CONTEXT_ACQUIRE_TIMEOUT_SECONDS
+        """
+        if context_pool.exhausted():
+            oldest_id = self._least_recently_used_idle()
+            if oldest_id is not None:
+                logger.info(f"Browser contexts exhausted, evicting least recently used session: {oldest_id}")
+                await self.close_session(oldest_id)
+        
+        context = await context_pool.acquire()
+        if config.REUSE_STORAGE_STATE and storage_key:
+            try:
+                await storage_states.restore(context, storage_key)
+            except Exception:
+                await context_pool.release(context)
+                raise
+        
         session_id = str(uuid.uuid4())
-        self.sessions[session_id] = Session()
+        self.sessions[session_id] = Session(browser_context=context, storage_key=storage_key)
         logger.info(f"Created new session: {session_id}")
         return session_id
     
-    def get_session(self, session_id: str) -> Optional[Session]:
-        """Get a session by ID."""
+    def _least_recently_used_idle(self) -> Optional[str]:
+        """ID of the least recently used session with no request in flight, if any."""
+        for session_id, session in self.sessions.items():
+            if not session.in_flight:
+                return session_id
+        return None
+    
+    def get_session(self, session_id: str, touch: bool = True) -> Optional[Session]:
+        """
+        Get a session by ID.
+        
+        Args:
+            session_id: The unique session identifier
+            touch: Count this as activity, the one place last_activity and the
+                LRU order are updated; read-only callers pass False
+        """
         session = self.sessions.get(session_id)
-        if session:
+        if session and touch:
             session.last_activity = datetime.now()
+            self.sessions.move_to_end(session_id)
         return session
     
     async def cleanup_expired_sessions(self):
         """Remove sessions that have been inactive for too long."""
         while True:
             try:
-                await asyncio.sleep(300)  # Check every 5 minutes
-                current_time = datetime.now()
+                await asyncio.sleep(config.SESSION_CLEANUP_INTERVAL_SECONDS)
+                cutoff = datetime.now() - timedelta(minutes=config.SESSION_TIMEOUT_MINUTES)
                 expired_sessions = []
                 
+                # Sessions are ordered by last activity, so only the expired head is visited
                 for session_id, session in self.sessions.items():
-                    time_inactive = current_time - session.last_activity
-                    if time_inactive > timedelta(minutes=config.SESSION_TIMEOUT_MINUTES):
+                    if session.last_activity >= cutoff:
+                        break
+                    if not session.in_flight:
                         expired_sessions.append(session_id)
                 
                 for session_id in expired_sessions:
@@ -409,35 +306,209 @@ class SessionManager:
     
     async def close_session(self, session_id: str):
         """Close and remove a session."""
-        if session_id in self.sessions:
-            session = self.sessions[session_id]
-            # Close all pages
-            for page in session.all_pages:
-                try:
-                    await page.close()
-                except Exception as e:
-                    logger.error(f"Error closing page: {e}")
-            
-            if session.page:
-                try:
-                    await session.page.close()
-                except Exception as e:
-                    logger.error(f"Error closing main page for session {session_id}: {e}")
-            
-            # Close browser context if it exists
-            if session.browser_context:
-                try:
-                    await session.browser_context.close()
-                except Exception as e:
-                    logger.error(f"Error closing browser context: {e}")
-            
-            del self.sessions[session_id]
-            logger.info(f"Closed session: {session_id}")
+        # Unregister first so concurrent callers never close the same session twice
+        session = self.sessions.pop(session_id, None)
+        if not session:
+            return
+        session.closed = True
+        
+        # Stop watching new tabs load; their pages are about to close
+        for task in list(session.popup_tasks):
+            task.cancel()
+        await asyncio.gather(*session.popup_tasks, return_exceptions=True)
+        
+        # Close all pages concurrently (the main page is usually in all_pages too)
+        pages = set(session.all_pages)
+        if session.page:
+            pages.add(session.page)
+        results = await asyncio.gather(*(page.close() for page in pages), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Error closing page for session {session_id}: {result}")
+        
+        # Close browser context if it exists
+        if session.browser_context:
+            try:
+                await context_pool.release(session.browser_context)
+            except Exception as e:
+                logger.error(f"Error closing browser context: {e}")
+        
+        logger.info(f"Closed session: {session_id}")
     
     
 session_manager = SessionManager()
 
 
+class ContextPool:
+    """Keeps pre-warmed browser contexts ready so new sessions skip context creation."""
+    
+    def __init__(self, size: int, max_contexts: int):
+        self.size = size
+        self._browser: Optional[Browser] = None
+        # Bounds contexts held by sessions; idle warm ones don't count
+        self._slots = asyncio.Semaphore(max_contexts)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._refills: set = set()
+    
+    async def start(self, browser: Browser):
+        """Fill the pool from the given browser."""
+        self._browser = browser
+        for context in await asyncio.gather(*(self._new_context() for _ in range(self.size))):
+            self._idle.put_nowait(context)
+        logger.info(f"Warmed {self.size} browser contexts")
+    
+    async def acquire(self) -> BrowserContext:
+        """
+        Take a warm context, creating one on the spot if the pool is drained.
+        
+        Waits for a session to release its context while MAX_BROWSER_CONTEXTS are
+        in use. Contexts are never handed to a second session: clearing cookies and
+        permissions leaves localStorage, IndexedDB and service workers behind, so
+        a replacement is warmed in the background instead.
+        
+        Raises:
+            asyncio.TimeoutError: No context freed up within CONTEXT_ACQUIRE_TIMEOUT_SECONDS
+        """
+        await asyncio.wait_for(self._slots.acquire(), config.CONTEXT_ACQUIRE_TIMEOUT_SECONDS)
+        try:
+            try:
+                context = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                context = await self._new_context()
+        except Exception:
+            self._slots.release()
+            raise
+        self._schedule_refill()
+        return context
+    
+    def exhausted(self) -> bool:
+        """Whether every context slot is held by a session."""
+        return self._slots.locked()
+    
+    async def release(self, context: BrowserContext):
+        """Close a session's context and free its slot."""
+        try:
+            await context.close()
+        finally:
+            self._slots.release()
+    
+    async def _new_context(self) -> BrowserContext:
+        """Create a context with the page helper scripts preinstalled."""
+        context = await self._browser.new_context()
+        await context.add_init_script(PAGE_HELPERS_INIT_JS)
+        return context
+    
+    def _schedule_refill(self):
+        """Start warming a replacement context unless the pool is already full."""
+        if self._idle.qsize() + len(self._refills) >= self.size:
+            return
+        task = asyncio.create_task(self._refill())
+        self._refills.add(task)
+        task.add_done_callback(self._refills.discard)
+    
+    async def _refill(self):
+        try:
+            await self._idle.put(await self._new_context())
+        except Exception as e:
+            logger.warning(f"Failed to warm browser context: {e}")
+    
+    async def close(self):
+        """Cancel pending warmups and close idle contexts."""
+        for task in list(self._refills):
+            task.cancel()
+        while not self._idle.empty():
+            context = self._idle.get_nowait()
+            try:
+                await context.close()
+            except Exception as e:
+                logger.error(f"Error closing pooled context: {e}")
+
+
+context_pool = ContextPool(config.CONTEXT_POOL_SIZE, config.MAX_BROWSER_CONTEXTS)
+
+
+class StorageStateStore:
+    """
+    Saves cookies and localStorage per tester and site when a task completes and
+    preloads a tester's saved states into their new sessions, so logins done once
+    are skipped afterwards.
+    
+    States are keyed by the storage_key a session was started with; sessions
+    without one neither restore nor save anything. Off unless REUSE_STORAGE_STATE is set.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._states: Optional[Dict[str, Dict[str, dict]]] = None  # storage key -> hostname -> storage state
+    
+    async def _load(self) -> Dict[str, Dict[str, dict]]:
+        """Read the states saved by earlier runs once, off the event loop."""
+        if self._states is None:
+            states = await asyncio.to_thread(self._read_all)
+            if self._states is None:  # Another caller may have finished loading first
+                self._states = states
+        return self._states
+    
+    def _read_all(self) -> Dict[str, Dict[str, dict]]:
+        states: Dict[str, Dict[str, dict]] = {}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                try:
+                    with open(os.path.join(self.directory, name), "rb") as f:
+                        state = orjson.loads(f.read())
+                    states.setdefault(state["storage_key"], {})[state["hostname"]] = state
+                except Exception as e:
+                    logger.warning(f"Ignoring unreadable storage state {name}: {e}")
+        return states
+    
+    def _write(self, name: str, data: bytes):
+        """Write a state file atomically so a crash never leaves a truncated one."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    
+    async def save(self, context: BrowserContext, storage_key: str, url: str):
+        """Record the context's storage for `storage_key` under the hostname of `url`."""
+        hostname = urlsplit(url).hostname
+        if not hostname:
+            return
+        state = await context.storage_state()
+        state["storage_key"] = storage_key
+        state["hostname"] = hostname
+        (await self._load()).setdefault(storage_key, {})[hostname] = state
+        
+        digest = hashlib.blake2b(f"{storage_key}\0{hostname}".encode(), digest_size=8).hexdigest()
+        await asyncio.to_thread(self._write, f"{digest}.json", orjson.dumps(state))
+        logger.info(f"Saved storage state for {hostname}")
+    
+    async def restore(self, context: BrowserContext, storage_key: str):
+        """Preload the states saved for `storage_key` into a fresh context."""
+        states = (await self._load()).get(storage_key, {}).values()
+        cookies = [cookie for state in states for cookie in state.get("cookies", [])]
+        if cookies:
+            await context.add_cookies(cookies)
+        
+        local_storage = {
+            origin["origin"]: origin["localStorage"]
+            for state in states for origin in state.get("origins", [])
+        }
+        if local_storage:
+            # Seed only missing keys so the page's own later writes survive reloads
+            await context.add_init_script(f"""
+            (() => {{
+                const items = {orjson.dumps(local_storage).decode()}[location.origin] || [];
+                for (const {{ name, value }} of items) {{
+                    if (localStorage.getItem(name) === null) localStorage.setItem(name, value);
+                }}
+            }})();
+            """)
+
+
+storage_states = StorageStateStore(config.STORAGE_STATE_DIR)
+
+
 class TabManager:
     """Manages browser tabs/pages within a session."""
     
@@ -451,27 +522,26 @@ class TabManager:
             pages = session.browser_context.pages
             page_info = []
             
-            # Clean up closed pages from tracking list
-            session.all_pages = [p for p in session.all_pages if not p.is_closed()]
+            # Skip closed pages; indexes stay those of browser_context.pages for switch_tab
+            open_tabs = [(idx, page) for idx, page in enumerate(pages) if not page.is_closed()]
             
-            for idx, page in enumerate(pages):
-                try:
-                    # Skip closed pages
-                    if page.is_closed():
-                        continue
-                    
-                    title = await page.title()
-                    url = page.url
-                    is_current = page == session.page
-                    
-                    page_info.append({
-                        "index": idx,
-                        "title": title[:100],
-                        "url": url,
-                        "is_current": is_current
-                    })
-                except Exception as e:
-                    logger.warning(f"Error getting page info for tab {idx}: {e}")
+            # Fetch all titles concurrently rather than one round-trip per tab
+            titles = await asyncio.gather(
+                *(page.title() for _, page in open_tabs),
+                return_exceptions=True
+            )
+            
+            for (idx, page), title in zip(open_tabs, titles):
+                if isinstance(title, Exception):
+                    logger.warning(f"Error getting page info for tab {idx}: {title}")
+                    continue
+                
+                page_info.append({
+                    "index": idx,
+                    "title": title[:100],
+                    "url": page.url,
+                    "is_current": page == session.page
+                })
             
             return page_info
         except Exception as e:
@@ -556,163 +626,849 @@ class TabManager:
             if not session.browser_context or not session.page:
                 return 0
             
-            pages = session.browser_context.pages
             current_page = session.page
+            targets = [p for p in session.browser_context.pages if p != current_page and not p.is_closed()]
             closed_count = 0
             
-            for page in pages:
-                if page != current_page and not page.is_closed():
-                    try:
-                        await page.close()
-                        closed_count += 1
-                        logger.debug(f"Closed tab: {page.url}")
-                    except Exception as e:
-                        logger.warning(f"Error closing tab {page.url}: {e}")
+            # Independent closes, so issue them all at once
+            results = await asyncio.gather(*(p.close() for p in targets), return_exceptions=True)
+            for page, result in zip(targets, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Error closing tab {page.url}: {result}")
+                else:
+                    closed_count += 1
+                    logger.debug(f"Closed tab: {page.url}")
             
             logger.info(f"Closed {closed_count} other tabs, kept current tab")
             
-            # Clean up the tracking list
-            session.all_pages = [p for p in session.all_pages if not p.is_closed()]
-            
             return closed_count
         except Exception as e:
             logger.error(f"Error closing other tabs: {e}")
             return 0
 
 
+# Collects visible interactive elements; installed in every document of pooled
+# contexts as window.__getPageElements so it isn't reshipped on each call
+PAGE_ELEMENTS_JS = """
+    (() => {
+        // Built once per document rather than joined on every call
+        const SELECTOR = [
+            'input', 'button', 'a', 'textarea', 'select',
+            '[role="button"]', '[role="link"]', '[role="textbox"]',
+            '[role="combobox"]', '[role="listbox"]', '[role="option"]',
+            '[onclick]', '[type="submit"]'
+        ].join(',');
+
+        return (maxElements) => {
+            const elements = [];
+            const allElements = document.querySelectorAll(SELECTOR);
+
+            for (let index = 0; index < allElements.length && elements.length < maxElements; index++) {
+                const el = allElements[index];
+
+                // Only include visible elements; the cheap size check runs before
+                // getComputedStyle, which forces a style recalc
+                const rect = cachedRect(el);
+                if (!rect.width || !rect.height) continue;
+                const style = window.getComputedStyle(el);
+                if (style.visibility === 'hidden' || style.display === 'none') continue;
+
+                const tag = el.tagName.toLowerCase();
+                const role = el.getAttribute('role');
+                // Long strings are cut here, at the producer, so they never cross CDP;
+                // same-origin links only need their path
+                const href = typeof el.href === 'string' && el.href.startsWith(location.origin)
+                    ? el.href.slice(location.origin.length) : el.href;
+                const fields = {
+                    type: el.type,
+                    id: el.id,
+                    class: el.getAttribute('class')?.slice(0, 30),  // Also a string for SVG elements
+                    name: el.name,
+                    placeholder: el.placeholder?.slice(0, 80),
+                    value: typeof el.value === 'string' ? el.value.slice(0, 50) : el.value,
+                    text: el.textContent?.trim().substring(0, 50),
+                    ariaLabel: el.getAttribute('aria-label')?.slice(0, 80),
+                    role: role,
+                    href: typeof href === 'string' ? href.slice(0, 100) : null,
+                    target: el.target,  // Show if link opens in new tab
+                    opensInNewTab: tag === 'a' && el.target === '_blank'
+                };
+
+                // For select elements, add options
+                if (tag === 'select') {
+                    const options = Array.from(el.options).map(opt => opt.text.trim());
+                    if (options.length > 0) {
+                        fields.options = options.slice(0, 10);  // Limit to 10 options
+                        fields.isDropdown = true;
+                    }
+                }
+
+                // For elements with role="combobox" or "listbox", mark as dropdown
+                if (role === 'combobox' || role === 'listbox') {
+                    fields.isDropdown = true;
+                }
+
+                // Keep only the fields that carry a value
+                const info = { index: index, tag: tag };
+                let kept = 0;
+                for (const key in fields) {
+                    if (fields[key]) {
+                        info[key] = fields[key];
+                        kept++;
+                    }
+                }
+
+                if (kept > 0) { // More than just index and tag
+                    elements.push(info);
+                }
+            }
+
+            return elements;
+        }
+    })()
+"""
+
+# Browser-side action implementations, installed once per document as window.__bt
+# so each action ships only its arguments over CDP
+SELECT_DROPDOWN_JS = """
+    (() => {
+        // Dropdown-specific lookups layered over the shared FINDERS
+        const finders = {
+            text: (selector) => Array.from(document.querySelectorAll('select, [role="combobox"], [role="listbox"]')).find(el => {
+                const text = el.textContent?.trim() || '';
+                const label = el.getAttribute('aria-label') || '';
+                return text.includes(selector) || label.includes(selector);
+            }),
+            label: (selector) => labelledControl(selector, 'select, [role="combobox"]'),
+        };
+
+        return (args) => {
+            const { selector, value, selectorType } = args;
+
+            // Find the dropdown element
+            const element = findElement(selectorType, selector, finders);
+
+            if (!element) {
+                return { success: false, error: 'Dropdown not found' };
+            }
+
+            revealElement(element);
+
+            // Handle native select element
+            if (element.tagName.toLowerCase() === 'select') {
+                const options = Array.from(element.options);
+                const option = options.find(opt => 
+                    opt.text.trim() === value || 
+                    opt.value === value ||
+                    opt.text.trim().includes(value)
+                );
+
+                if (option) {
+                    element.value = option.value;
+                    element.dispatchEvent(new Event('change', { bubbles: true }));
+                    element.dispatchEvent(new Event('input', { bubbles: true }));
+                    return { success: true, type: 'native', selected: option.text };
+                } else {
+                    return { success: false, error: `Option "${value}" not found`, availableOptions: options.map(o => o.text) };
+                }
+            }
+
+            // Handle custom dropdown (role="combobox")
+            if (element.getAttribute('role') === 'combobox' || element.getAttribute('role') === 'listbox') {
+                // Click to open dropdown
+                element.click();
+
+                // Pick the option as soon as the menu renders it, and report what happened
+                return new Promise((resolve) => {
+                    const matches = (opt) => {
+                        const text = opt.textContent.trim();
+                        return text === value || text.includes(value);
+                    };
+                    const pick = (option) => {
+                        option.click();
+                        resolve({ success: true, type: 'custom', selected: option.textContent.trim() });
+                    };
+
+                    // Menus rendered by the click itself (or kept in the DOM) are already there
+                    const existing = Array.from(document.querySelectorAll('[role="option"]')).find(matches);
+                    if (existing) return pick(existing);
+
+                    // Otherwise look only at what gets inserted, up to 1.5 s
+                    const observer = new MutationObserver((mutations) => {
+                        for (const mutation of mutations) {
+                            for (const node of mutation.addedNodes) {
+                                if (node.nodeType !== Node.ELEMENT_NODE) continue;
+                                const option = node.getAttribute('role') === 'option' && matches(node)
+                                    ? node : Array.from(node.querySelectorAll('[role="option"]')).find(matches);
+                                if (option) {
+                                    observer.disconnect();
+                                    clearTimeout(timer);
+                                    return pick(option);
+                                }
+                            }
+                        }
+                    });
+                    observer.observe(document.body, { childList: true, subtree: true });
+                    const timer = setTimeout(() => {
+                        observer.disconnect();
+                        const available = Array.from(document.querySelectorAll('[role="option"]')).map(o => o.textContent.trim());
+                        resolve({ success: false, error: `Option "${value}" not found`, availableOptions: available });
+                    }, 1500);
+                });
+            }
+
+            return { success: false, error: 'Not a dropdown element' };
+        };
+    })()
+"""
+
+CLICK_ELEMENT_JS = """
+    (() => {
+        const clickableSelectors = 'a, button, [role="button"], [role="link"], [onclick], input[type="submit"], input[type="button"]';
+        // A single native click; a second synthetic click would fire handlers twice.
+        // The press/release pair is only simulated for elements listening for it
+        const clickOnce = (element) => {
+            if (element.onmousedown || element.onmouseup) {
+                element.dispatchEvent(new MouseEvent('mousedown', { bubbles: true }));
+                element.dispatchEvent(new MouseEvent('mouseup', { bubbles: true }));
+            }
+            element.click();
+        };
+        const finders = {
+            text: (selector) => {
+                // Find clickable elements with matching text
+                const candidates = document.querySelectorAll(clickableSelectors);
+                for (let i = 0; i < candidates.length; i++) {
+                    const el = candidates[i];
+                    if (el.textContent.includes(selector) || (el.getAttribute('aria-label') || '').includes(selector)) {
+                        return el;
+                    }
+                }
+
+                // If no clickable element matches, take the element holding exactly that
+                // text; walking text nodes skips building textContent for every element
+                const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+                for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+                    if (node.data.trim() === selector) return node.parentElement;
+                }
+                return null;
+            },
+        };
+
+        return (args) => {
+            const { selector, selectorType, openInNewTab } = args;
+            const element = findElement(selectorType, selector, finders);
+
+            if (element) {
+                revealElement(element);
+
+                // Check if link already opens in new tab
+                const alreadyOpensInNewTab = element.tagName === 'A' && 
+                    (element.target === '_blank' || element.rel?.includes('noopener'));
+
+                // If it's a link and we want new tab behavior
+                if (element.tagName === 'A' && openInNewTab && !alreadyOpensInNewTab) {
+                    // Modify the link to open in new tab
+                    const originalTarget = element.target;
+                    element.target = '_blank';
+                    element.rel = 'noopener noreferrer';
+
+                    // Click it
+                    clickOnce(element);
+
+                    // Restore original target
+                    element.target = originalTarget;
+
+                    return {
+                        success: true,
+                        tagName: element.tagName,
+                        text: element.textContent.trim().substring(0, 50),
+                        openedInNewTab: true,
+                        wasModified: true
+                    };
+                } else {
+                    // Normal click or already opens in new tab
+                    clickOnce(element);
+
+                    return {
+                        success: true,
+                        tagName: element.tagName,
+                        text: element.textContent.trim().substring(0, 50),
+                        openedInNewTab: alreadyOpensInNewTab,
+                        wasModified: false
+                    };
+                }
+            }
+            return { success: false, error: 'Element not found' };
+        };
+    })()
+"""
+
+FILL_INPUT_JS = """
+    (() => {
+        const finders = {
+            label: (selector) => labelledControl(selector, 'input, textarea, select'),
+        };
+
+        return (args) => {
+            const { selector, value, selectorType } = args;
+            const element = findElement(selectorType, selector, finders);
+
+            if (element) {
+                revealElement(element);
+                element.focus();
+                element.value = value;
+                element.dispatchEvent(new Event('input', { bubbles: true }));
+                element.dispatchEvent(new Event('change', { bubbles: true }));
+                return true;
+            }
+            return false;
+        };
+    })()
+"""
+
+PRESS_KEY_JS = """
+    (args) => {
+        const { key } = args;
+        const activeElement = document.activeElement;
+        if (activeElement) {
+            const event = new KeyboardEvent('keydown', {
+                key: key,
+                code: key,
+                bubbles: true,
+                cancelable: true
+            });
+            activeElement.dispatchEvent(event);
+
+            const keyupEvent = new KeyboardEvent('keyup', {
+                key: key,
+                code: key,
+                bubbles: true,
+                cancelable: true
+            });
+            activeElement.dispatchEvent(keyupEvent);
+            return true;
+        }
+        return false;
+    }
+"""
+
+WAIT_FOR_ELEMENT_JS = """
+    (() => {
+        const finders = {
+            // The root contains every other element's text, so checking it
+            // once answers "does any element contain the text"
+            text: (selector) => document.documentElement.textContent.includes(selector) ? document.documentElement : null,
+        };
+
+        return (args) => {
+            const { selector, selectorType, timeout } = args;
+            const check = () => findElement(selectorType, selector, finders);
+
+            return new Promise((resolve) => {
+                if (check()) return resolve(true);
+
+                // Re-check only when the DOM changes instead of polling on a timer
+                const observer = new MutationObserver(() => {
+                    if (check()) {
+                        observer.disconnect();
+                        clearTimeout(timer);
+                        resolve(true);
+                    }
+                });
+                observer.observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+                const timer = setTimeout(() => {
+                    observer.disconnect();
+                    resolve(!!check());
+                }, timeout);
+            });
+        };
+    })()
+"""
+
+ELEMENT_INFO_JS = """
+    (() => {
+        const finders = {
+            text: (selector) => {
+                const elements = document.getElementsByTagName('*');
+                for (let i = 0; i < elements.length; i++) {
+                    if (elements[i].textContent.trim().includes(selector)) return elements[i];
+                }
+                return null;
+            },
+        };
+
+        return (args) => {
+            const { selector, selectorType } = args;
+            const element = findElement(selectorType, selector, finders);
+
+            if (element) {
+                const rect = cachedRect(element);
+                return {
+                    tagName: element.tagName,
+                    text: element.textContent.trim(),
+                    value: element.value || null,
+                    visible: rect.width > 0 && rect.height > 0,
+                    enabled: !element.disabled,
+                    x: rect.x,
+                    y: rect.y,
+                    width: rect.width,
+                    height: rect.height
+                };
+            }
+            return null;
+        };
+    })()
+"""
+
+# Runs click/fill/select steps back to back in one round-trip, letting a frame
+# render between steps; stops at the first failure
+RUN_CHAIN_JS = """
+    async (steps) => {
+        const run = {
+            click: (step) => window.__bt.click({ selector: step.selector, selectorType: step.selector_type || 'css', openInNewTab: !!step.open_in_new_tab }),
+            fill: (step) => window.__bt.fill({ selector: step.selector, value: step.value ?? '', selectorType: step.selector_type || 'css' }),
+            select: (step) => window.__bt.select({ selector: step.selector, value: step.value ?? '', selectorType: step.selector_type || 'css' }),
+        };
+        const results = [];
+        for (const step of steps) {
+            const handler = run[step.action];
+            let ok = false;
+            let error = null;
+            try {
+                const result = handler ? await handler(step) : null;
+                ok = result === true || !!(result && result.success);
+                if (!ok) error = handler ? (result && result.error) || 'Step failed' : `Unsupported chain action: ${step.action}`;
+            } catch (e) {
+                error = String(e);
+            }
+            results.push({ action: step.action, ok, error });
+            if (!ok) break;
+            await new Promise(resolve => requestAnimationFrame(() => resolve()));
+        }
+        return {
+            results,
+            url: location.href,
+            title: document.title,
+            focus: document.activeElement ? document.activeElement.tagName.toLowerCase() : null,
+        };
+    }
+"""
+
+BROWSER_ACTIONS_JS = {
+    "select": SELECT_DROPDOWN_JS,
+    "click": CLICK_ELEMENT_JS,
+    "fill": FILL_INPUT_JS,
+    "press": PRESS_KEY_JS,
+    "waitFor": WAIT_FOR_ELEMENT_JS,
+    "info": ELEMENT_INFO_JS,
+    "chain": RUN_CHAIN_JS,
+}
+
+# Installs the helpers above in every document of pooled contexts. Also versions the
+# document: every DOM mutation or input bumps __domVersion, so a snapshot key only
+# repeats while the element list can't have changed. Element rects are memoized
+# (cachedRect) until the next mutation, scroll or resize; a navigation starts a new
+# document and with it an empty cache. Actions bring their element into view with
+# revealElement and look it up with findElement, which remembers its results until
+# the DOM mutates
+PAGE_HELPERS_INIT_JS = f"""
+(() => {{
+    let rectCache = new WeakMap();
+    const cachedRect = (el) => {{
+        let rect = rectCache.get(el);
+        if (!rect) {{
+            rect = el.getBoundingClientRect();
+            rectCache.set(el, rect);
+        }}
+        return rect;
+    }};
+    const clearRectCache = () => {{ rectCache = new WeakMap(); }};
+    // Element lookups shared by the actions, which layer their own text/label
+    // matching on top; unknown selector types find nothing
+    const FIRST_ORDERED_NODE = XPathResult.FIRST_ORDERED_NODE_TYPE;
+    const FINDERS = {{
+        // Plain #id, .class and tag selectors skip selector parsing
+        css: (selector) => {{
+            if (selector[0] === '#' && /^#[\\w-]+$/.test(selector)) return document.getElementById(selector.slice(1));
+            if (selector[0] === '.' && /^\\.[\\w-]+$/.test(selector)) return document.getElementsByClassName(selector.slice(1))[0];
+            if (/^[a-zA-Z][a-zA-Z0-9]*$/.test(selector)) return document.getElementsByTagName(selector)[0];
+            return document.querySelector(selector);
+        }},
+        xpath: (selector) => document.evaluate(selector, document, null, FIRST_ORDERED_NODE, null).singleNodeValue,
+        // Input/textarea with matching placeholder (exact or partial match)
+        placeholder: (selector) => Array.from(document.querySelectorAll('input, textarea')).find(el => {{
+            const ph = el.getAttribute('placeholder');
+            return ph && ph.includes(selector);
+        }}),
+    }};
+    // finder -> selector -> element it found; any DOM mutation drops the lot, so an
+    // entry is exactly what the finder would return again (fill, click and info on
+    // the same css selector walk the tree once)
+    let elementCache = new WeakMap();
+    const findElement = (selectorType, selector, finders) => {{
+        const find = finders[selectorType] || FINDERS[selectorType];
+        if (!find) return null;
+        let found = elementCache.get(find);
+        if (!found) {{
+            found = new Map();
+            elementCache.set(find, found);
+        }}
+        let element = found.get(selector);
+        // Mutation records arrive a microtask late, so also check it's still attached
+        if (!element || !element.isConnected) {{
+            element = find(selector) || null;
+            if (element) found.set(selector, element);
+        }}
+        return element;
+    }};
+    // The control a <label> containing `text` points at, or the first `fallback` match inside it
+    const labelledControl = (text, fallback) => {{
+        const label = Array.from(document.querySelectorAll('label')).find(l => l.textContent.includes(text));
+        if (!label) return null;
+        const forId = label.getAttribute('for');
+        return (forId && document.getElementById(forId)) || label.querySelector(fallback);
+    }};
+    // Jump (no smooth animation delaying the events that follow) only to elements
+    // that aren't already fully in the viewport
+    const revealElement = (el) => {{
+        const rect = cachedRect(el);
+        if (rect.top < 0 || rect.bottom > window.innerHeight) {{
+            el.scrollIntoView({{ behavior: 'instant', block: 'center' }});
+        }}
+    }};
+    window.__bt = {{ {", ".join(f"{name}: {source}" for name, source in BROWSER_ACTIONS_JS.items())}, clearRectCache }};
+    window.__getPageElements = {PAGE_ELEMENTS_JS};
+    window.__documentId = Math.random().toString(36).slice(2);
+    window.__domVersion = 0;
+    const bumpDomVersion = () => {{ window.__domVersion++; clearRectCache(); }};
+    new MutationObserver(() => {{
+        bumpDomVersion();
+        elementCache = new WeakMap();
+    }}).observe(document, {{
+        subtree: true, childList: true, attributes: true, characterData: true
+    }});
+    window.addEventListener('input', bumpDomVersion, true);
+    window.addEventListener('scroll', clearRectCache, {{ capture: true, passive: true }});
+    window.addEventListener('resize', clearRectCache);
+    window.__pageSnapshot = (maxElements, lastKey) => {{
+        const key = window.__documentId + ':' + window.__domVersion + ':' + location.href;
+        if (key === lastKey) return null;
+        return JSON.stringify({{ key, elements: window.__getPageElements(maxElements) }});
+    }};
+}})();
+"""
+
+
+# The only sources sent per call once the helpers are installed; both report a
+# missing install (false / installed: false) so callers can install and retry
+PAGE_SNAPSHOT_CALL_JS = "([maxElements, lastKey]) => window.__pageSnapshot ? window.__pageSnapshot(maxElements, lastKey) : false"
+BT_CALL_JS = "async ([name, args]) => window.__bt ? { installed: true, result: await window.__bt[name](args) } : { installed: false }"
+
+
 class DOMInspector:
     """Extracts detailed page information for the LLM."""
     
+    # page -> (snapshot key, formatted output) of its last snapshot
+    _snapshots: "weakref.WeakKeyDictionary[Page, tuple[str, str]]" = weakref.WeakKeyDictionary()
+    
     @staticmethod
     async def get_page_elements(page: Page) -> str:
         """
         Extract all interactive and visible elements from the page.
         
+        The previous output is reused while the document hasn't changed since it
+        was taken.
+        
         Returns:
             Formatted string with element information
         """
         try:
-            js_code = """
-            () => {
-                const elements = [];
-                const selectors = [
-                    'input', 'button', 'a', 'textarea', 'select',
-                    '[role="button"]', '[role="link"]', '[role="textbox"]',
-                    '[role="combobox"]', '[role="listbox"]', '[role="option"]',
-                    '[onclick]', '[type="submit"]'
-                ];
-                
-                const allElements = document.querySelectorAll(selectors.join(','));
-                
-                allElements.forEach((el, index) => {
-                    const rect = el.getBoundingClientRect();
-                    
-                    // Only include visible elements
-                    if (rect.width > 0 && rect.height > 0 && 
-                        window.getComputedStyle(el).visibility !== 'hidden' &&
-                        window.getComputedStyle(el).display !== 'none') {
-                        
-                        const info = {
-                            index: index,
-                            tag: el.tagName.toLowerCase(),
-                            type: el.type || null,
-                            id: el.id || null,
-                            class: el.className || null,
-                            name: el.name || null,
-                            placeholder: el.placeholder || null,
-                            value: el.value || null,
-                            text: el.textContent?.trim().substring(0, 100) || null,
-                            ariaLabel: el.getAttribute('aria-label') || null,
-                            role: el.getAttribute('role') || null,
-                            href: el.href || null,
-                            target: el.target || null,  // Show if link opens in new tab
-                            opensInNewTab: (el.tagName.toLowerCase() === 'a' && el.target === '_blank') || null
-                        };
-                        
-                        // For select elements, add options
-                        if (el.tagName.toLowerCase() === 'select') {
-                            const options = Array.from(el.options).map(opt => opt.text.trim());
-                            if (options.length > 0) {
-                                info.options = options.slice(0, 10);  // Limit to 10 options
-                                info.isDropdown = true;
-                            }
-                        }
-                        
-                        // For elements with role="combobox" or "listbox", mark as dropdown
-                        if (el.getAttribute('role') === 'combobox' || el.getAttribute('role') === 'listbox') {
-                            info.isDropdown = true;
-                        }
-                        
-                        // Clean up the info object
-                        Object.keys(info).forEach(key => {
-                            if (info[key] === null || info[key] === '') {
-                                delete info[key];
-                            }
-                        });
-                        
-                        if (Object.keys(info).length > 2) { // More than just index and tag
-                            elements.push(info);
-                        }
-                    }
-                });
-                
-                return elements.slice(0, 50); // Limit to 50 elements
-            }
-            """
-            
-            elements = await page.evaluate(js_code)
-            
-            if not elements:
-                return "No interactive elements found on the page."
-            
-            # Format elements nicely
-            output = "**Visible Interactive Elements on Page:**\n\n"
-            for elem in elements:
-                elem_desc = f"[{elem.get('index')}] {elem.get('tag')}"
-                
-                details = []
-                if elem.get('type'):
-                    details.append(f"type={elem['type']}")
-                if elem.get('id'):
-                    details.append(f"id={elem['id']}")
-                if elem.get('name'):
-                    details.append(f"name={elem['name']}")
-                if elem.get('placeholder'):
-                    details.append(f"placeholder=\"{elem['placeholder']}\"")
-                if elem.get('text') and not elem.get('isDropdown'):
-                    details.append(f"text=\"{elem['text'][:50]}\"")
-                if elem.get('ariaLabel'):
-                    details.append(f"aria-label=\"{elem['ariaLabel']}\"")
-                if elem.get('role'):
-                    details.append(f"role={elem['role']}")
-                if elem.get('opensInNewTab'):
-                    details.append(f"⚠️ OPENS_IN_NEW_TAB (target=_blank)")
-                if elem.get('isDropdown'):
-                    if elem.get('options'):
-                        options_str = ', '.join(elem['options'][:5])  # Show first 5 options
-                        if len(elem['options']) > 5:
-                            options_str += f", ... ({len(elem['options'])} total)"
-                        details.append(f"🔽 DROPDOWN options=[{options_str}]")
-                    else:
-                        details.append(f"🔽 DROPDOWN")
-                if elem.get('class') and not elem.get('isDropdown'):
-                    details.append(f"class=\"{elem['class'][:30]}\"")
-                
-                if details:
-                    elem_desc += f" - {', '.join(details)}"
-                
-                output += elem_desc + "\n"
+            cached = DOMInspector._snapshots.get(page)
+            args = [config.MAX_PAGE_ELEMENTS, cached[0] if cached else None]
+            expression = f"({PAGE_SNAPSHOT_CALL_JS})({orjson.dumps(args).decode()})"
+            # Goes over the page's CDP session like the actions, skipping Playwright's
+            # evaluate serialization
+            snapshot_json = await JavaScriptExecutor._evaluate(page, expression)
+            if snapshot_json is False:
+                # Pages created outside the pool lack the helpers; install them once
+                await page.evaluate(PAGE_HELPERS_INIT_JS)
+                snapshot_json = await JavaScriptExecutor._evaluate(page, expression)
+            if snapshot_json is None:
+                return cached[1]
             
+            # The list comes back as one JSON string, which orjson decodes faster than
+            # a per-value deserializer
+            snapshot = orjson.loads(snapshot_json)
+            output = DOMInspector._format_elements(snapshot["elements"])
+            DOMInspector._snapshots[page] = (snapshot["key"], output)
             return output
             
         except Exception as e:
             logger.error(f"Failed to extract page elements: {e}")
             return "Failed to extract page elements."
+    
+    # (key, format, max length or None, omitted for dropdowns) of the plain element
+    # details, in output order around the new-tab and dropdown markers
+    _LEADING_FIELDS = (
+        ('type', 'type={}', None, False),
+        ('id', 'id={}', None, False),
+        ('name', 'name={}', None, False),
+        ('placeholder', 'placeholder="{}"', None, False),
+        ('text', 'text="{}"', 50, True),
+        ('ariaLabel', 'aria-label="{}"', None, False),
+        ('role', 'role={}', None, False),
+    )
+    _TRAILING_FIELDS = (
+        ('class', 'class="{}"', 30, True),
+    )
+    
+    @staticmethod
+    def _append_fields(details: List[str], get: Callable[[str], Any], fields: tuple, is_dropdown: bool):
+        for key, template, max_length, hide_on_dropdown in fields:
+            value = get(key)
+            if value and not (hide_on_dropdown and is_dropdown):
+                details.append(template.format(value[:max_length] if max_length else value))
+    
+    @staticmethod
+    def _format_elements(elements: List[Dict[str, Any]]) -> str:
+        """Render the element list for the LLM prompt."""
+        if not elements:
+            return "No interactive elements found on the page."
+        
+        # Format elements nicely; lines are collected and joined once
+        output_parts = ["**Visible Interactive Elements on Page:**\n"]
+        for elem in elements:
+            get = elem.get
+            is_dropdown = get('isDropdown')
+            
+            details = []
+            DOMInspector._append_fields(details, get, DOMInspector._LEADING_FIELDS, is_dropdown)
+            if get('opensInNewTab'):
+                details.append(f"⚠️ OPENS_IN_NEW_TAB (target=_blank)")
+            if is_dropdown:
+                options = get('options')
+                if options:
+                    options_str = ', '.join(options[:5])  # Show first 5 options
+                    if len(options) > 5:
+                        options_str += f", ... ({len(options)} total)"
+                    details.append(f"🔽 DROPDOWN options=[{options_str}]")
+                else:
+                    details.append(f"🔽 DROPDOWN")
+            DOMInspector._append_fields(details, get, DOMInspector._TRAILING_FIELDS, is_dropdown)
+            
+            elem_desc = f"[{get('index')}] {get('tag')}"
+            if details:
+                elem_desc = f"{elem_desc} - {', '.join(details)}"
+            output_parts.append(elem_desc)
+        
+        return "\n".join(output_parts) + "\n"
+
+
+class NetworkWatch:
+    """
+    Follows a page's requests so a wait after an action sees the traffic that action
+    started. The page's own load state is no signal: right after a click it still
+    describes the document the click happened on, which is usually already idle.
+    
+    One watch per page, armed on first use: take mark() before an action and
+    await settle() after it.
+    """
+    
+    IDLE_SECONDS = 0.5  # Quiet period counted as idle, as with Playwright's networkidle
+    START_GRACE_SECONDS = 0.1  # Time an action gets to issue its first request
+    
+    # page -> its watch; watches hold no reference to their page, so entries go with it
+    _watches: "weakref.WeakKeyDictionary[Page, NetworkWatch]" = weakref.WeakKeyDictionary()
+    
+    def __init__(self):
+        self._pending: set = set()
+        self._requests = 0  # Requests started since the watch was armed
+        self._navigations = 0  # Main frame navigations since the watch was armed
+        self._last_change = time.monotonic()
+        self._quiet = asyncio.Event()
+        self._quiet.set()
+    
+    @classmethod
+    def for_page(cls, page: Page) -> 'NetworkWatch':
+        """Return the page's watch, arming it on first use."""
+        watch = cls._watches.get(page)
+        if watch is None:
+            watch = cls()
+            page.on("request", watch._on_request)
+            page.on("requestfinished", watch._on_done)
+            page.on("requestfailed", watch._on_done)
+            page.on("framenavigated", watch._on_navigated)
+            page.on("close", lambda _: watch._pending.clear())
+            cls._watches[page] = watch
+        return watch
+    
+    def _on_request(self, request):
+        self._requests += 1
+        self._pending.add(request)
+        self._last_change = time.monotonic()
+        self._quiet.clear()
+    
+    def _on_done(self, request):
+        self._pending.discard(request)
+        self._last_change = time.monotonic()
+        if not self._pending:
+            self._quiet.set()
+    
+    def _on_navigated(self, frame):
+        if frame.parent_frame is None:
+            self._navigations += 1
+    
+    def mark(self) -> Tuple[int, int]:
+        """Where settle() counts from: the request and navigation counts before an action."""
+        return self._requests, self._navigations
+    
+    async def settle(self, page: Page, mark: Tuple[int, int], timeout: Optional[int] = None) -> None:
+        """
+        Wait for the requests started since `mark` to finish and the network to stay
+        quiet for IDLE_SECONDS, then for the load event if the page navigated.
+        
+        Returns after START_GRACE_SECONDS when nothing went to the network, and gives
+        up after `timeout` ms (ACTION_SETTLE_TIMEOUT by default).
+        """
+        timeout_at = time.monotonic() + (timeout or config.ACTION_SETTLE_TIMEOUT) / 1000
+        try:
+            if self._requests == mark[0]:
+                await asyncio.sleep(self.START_GRACE_SECONDS)
+                if self._requests == mark[0]:
+                    return
+            while True:
+                await asyncio.wait_for(self._quiet.wait(), timeout_at - time.monotonic())
+                quiet_for = time.monotonic() - self._last_change
+                if quiet_for >= self.IDLE_SECONDS:
+                    break
+                if time.monotonic() + self.IDLE_SECONDS - quiet_for > timeout_at:
+                    return
+                await asyncio.sleep(self.IDLE_SECONDS - quiet_for)
+            remaining = timeout_at - time.monotonic()
+            if self._navigations > mark[1] and remaining > 0:
+                # The new document has committed by now, so this waits on its load event
+                await page.wait_for_load_state('load', timeout=remaining * 1000)
+        except Exception:
+            pass  # Out of time; pages that never go idle only cost the timeout
 
 
 class JavaScriptExecutor:
     """Executes browser interactions using JavaScript, similar to Cursor's approach."""
     
+    # page -> raw CDP session its actions are evaluated over
+    _cdp_sessions: "weakref.WeakKeyDictionary[Page, CDPSession]" = weakref.WeakKeyDictionary()
+    
+    # Input.dispatchKeyEvent fields for named keys; keys with text also produce input
+    _KEY_EVENTS = {
+        "Enter": {"code": "Enter", "windowsVirtualKeyCode": 13, "text": "\r"},
+        "Tab": {"code": "Tab", "windowsVirtualKeyCode": 9},
+        "Escape": {"code": "Escape", "windowsVirtualKeyCode": 27},
+        "Backspace": {"code": "Backspace", "windowsVirtualKeyCode": 8},
+        "Delete": {"code": "Delete", "windowsVirtualKeyCode": 46},
+        "Space": {"key": " ", "code": "Space", "windowsVirtualKeyCode": 32, "text": " "},
+        "ArrowLeft": {"code": "ArrowLeft", "windowsVirtualKeyCode": 37},
+        "ArrowUp": {"code": "ArrowUp", "windowsVirtualKeyCode": 38},
+        "ArrowRight": {"code": "ArrowRight", "windowsVirtualKeyCode": 39},
+        "ArrowDown": {"code": "ArrowDown", "windowsVirtualKeyCode": 40},
+        "Home": {"code": "Home", "windowsVirtualKeyCode": 36},
+        "End": {"code": "End", "windowsVirtualKeyCode": 35},
+        "PageUp": {"code": "PageUp", "windowsVirtualKeyCode": 33},
+        "PageDown": {"code": "PageDown", "windowsVirtualKeyCode": 34},
+    }
+    
+    @staticmethod
+    async def _call(page: Page, name: str, args: Any) -> Any:
+        """Run a window.__bt action, installing the helpers first in pages created outside the pool."""
+        expression = f"({BT_CALL_JS})({orjson.dumps([name, args]).decode()})"
+        call = await JavaScriptExecutor._evaluate(page, expression)
+        if not call["installed"]:
+            await page.evaluate(PAGE_HELPERS_INIT_JS)
+            call = await JavaScriptExecutor._evaluate(page, expression)
+        return call.get("result")
+    
+    @staticmethod
+    async def _cdp(page: Page) -> CDPSession:
+        """Return the page's CDP session, opening it on first use."""
+        cdp = JavaScriptExecutor._cdp_sessions.get(page)
+        if cdp is None:
+            cdp = await page.context.new_cdp_session(page)
+            JavaScriptExecutor._cdp_sessions[page] = cdp
+        return cdp
+    
+    @staticmethod
+    async def _evaluate(page: Page, expression: str) -> Any:
+        """
+        Evaluate an expression with Runtime.evaluate on the page's CDP session.
+        
+        Actions are the hottest evaluate calls; sending them as plain JSON skips
+        Playwright's per-call argument and result serialization.
+        
+        Raises:
+            Exception: If the expression throws in the page
+        """
+        cdp = await JavaScriptExecutor._cdp(page)
+        response = await cdp.send("Runtime.evaluate", {
+            "expression": expression,
+            "returnByValue": True,
+            "awaitPromise": True,
+        })
+        details = response.get("exceptionDetails")
+        if details:
+            raise Exception(details.get("exception", {}).get("description") or details.get("text"))
+        return response["result"].get("value")
+    
+    @staticmethod
+    async def run_chain(page: Page, steps: List[Dict[str, Any]]) -> bool:
+        """
+        Run several click/fill/select/press_key steps with as few round-trips as possible.
+        
+        Runs of click/fill/select steps share a single evaluate. press_key steps go
+        through press_key over CDP like single key presses, since a synthetic Enter
+        never submits a form.
+        
+        Args:
+            page: The Playwright page object
+            steps: JSON commands, in the same format as single commands
+        
+        Returns:
+            True if every step succeeded, False otherwise
+        """
+        try:
+            network = NetworkWatch.for_page(page)
+            mark = network.mark()
+            ok = True
+            start = 0
+            while ok and start < len(steps):
+                if steps[start].get('action') == 'press_key':
+                    key = steps[start].get('value') or 'Enter'
+                    ok = await JavaScriptExecutor.press_key(page, key)
+                    if ok:
+                        logger.info(f"Chain step press_key '{key}' succeeded")
+                    else:
+                        logger.error(f"Chain step press_key '{key}' failed")
+                    start += 1
+                    continue
+                
+                end = start
+                while end < len(steps) and steps[end].get('action') != 'press_key':
+                    end += 1
+                segment = steps[start:end]
+                result = await JavaScriptExecutor._call(page, "chain", segment)
+                for step in result['results']:
+                    if step['ok']:
+                        logger.info(f"Chain step {step['action']} succeeded")
+                    else:
+                        logger.error(f"Chain step {step['action']} failed: {step['error']}")
+                logger.debug(f"Chain segment finished on {result['url']} ({result['title']}), focus: {result['focus']}")
+                ok = len(result['results']) == len(segment) and all(step['ok'] for step in result['results'])
+                start = end
+            await network.settle(page, mark)
+            return ok
+        except Exception as e:
+            logger.error(f"JavaScript chain failed: {e}")
+            return False
+    
     @staticmethod
     async def select_dropdown(page: Page, selector: str, value: str, selector_type: str = "css") -> bool:
         """
@@ -728,84 +1484,13 @@ class JavaScriptExecutor:
             True if successful, False otherwise
         """
         try:
-            js_code = """
-            (args) => {
-                const { selector, value, selectorType } = args;
-                let element = null;
-                
-                // Find the dropdown element
-                if (selectorType === 'css') {
-                    element = document.querySelector(selector);
-                } else if (selectorType === 'text') {
-                    const elements = Array.from(document.querySelectorAll('select, [role="combobox"], [role="listbox"]'));
-                    element = elements.find(el => {
-                        const text = el.textContent?.trim() || '';
-                        const label = el.getAttribute('aria-label') || '';
-                        return text.includes(selector) || label.includes(selector);
-                    });
-                } else if (selectorType === 'label') {
-                    const label = Array.from(document.querySelectorAll('label')).find(l => l.textContent.includes(selector));
-                    if (label) {
-                        const forId = label.getAttribute('for');
-                        element = forId ? document.getElementById(forId) : label.querySelector('select, [role="combobox"]');
-                    }
-                }
-                
-                if (!element) {
-                    return { success: false, error: 'Dropdown not found' };
-                }
-                
-                element.scrollIntoView({behavior: 'smooth', block: 'center'});
-                
-                // Handle native select element
-                if (element.tagName.toLowerCase() === 'select') {
-                    const options = Array.from(element.options);
-                    const option = options.find(opt => 
-                        opt.text.trim() === value || 
-                        opt.value === value ||
-                        opt.text.trim().includes(value)
-                    );
-                    
-                    if (option) {
-                        element.value = option.value;
-                        element.dispatchEvent(new Event('change', { bubbles: true }));
-                        element.dispatchEvent(new Event('input', { bubbles: true }));
-                        return { success: true, type: 'native', selected: option.text };
-                    } else {
-                        return { success: false, error: `Option "${value}" not found`, availableOptions: options.map(o => o.text) };
-                    }
-                }
-                
-                // Handle custom dropdown (role="combobox")
-                if (element.getAttribute('role') === 'combobox' || element.getAttribute('role') === 'listbox') {
-                    // Click to open dropdown
-                    element.click();
-                    
-                    // Wait a bit for dropdown to open
-                    setTimeout(() => {
-                        // Find and click the option
-                        const optionElements = document.querySelectorAll('[role="option"]');
-                        const targetOption = Array.from(optionElements).find(opt => 
-                            opt.textContent.trim() === value || 
-                            opt.textContent.trim().includes(value)
-                        );
-                        
-                        if (targetOption) {
-                            targetOption.click();
-                        }
-                    }, 100);
-                    
-                    return { success: true, type: 'custom', attempted: value };
-                }
-                
-                return { success: false, error: 'Not a dropdown element' };
-            }
-            """
-            result = await page.evaluate(js_code, {"selector": selector, "value": value, "selectorType": selector_type})
+            network = NetworkWatch.for_page(page)
+            mark = network.mark()
+            result = await JavaScriptExecutor._call(page, "select", {"selector": selector, "value": value, "selectorType": selector_type})
             
             if result.get('success'):
                 logger.info(f"Selected '{value}' in dropdown '{selector}' ({result.get('type')} dropdown)")
-                await page.wait_for_timeout(300)  # Brief wait for any handlers
+                await network.settle(page, mark)
                 return True
             else:
                 logger.error(f"Dropdown selection failed: {result.get('error')}")
@@ -831,83 +1516,11 @@ class JavaScriptExecutor:
             True if successful, False otherwise
         """
         try:
+            # Armed before the click so the requests it starts are seen
+            network = NetworkWatch.for_page(page)
+            mark = network.mark()
             # First try: JavaScript click with multiple event types
-            js_code = """
-            (args) => {
-                const { selector, selectorType, openInNewTab } = args;
-                let element = null;
-                
-                if (selectorType === 'css') {
-                    element = document.querySelector(selector);
-                } else if (selectorType === 'xpath') {
-                    element = document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                } else if (selectorType === 'text') {
-                    // Find clickable elements with matching text
-                    const clickableSelectors = 'a, button, [role="button"], [role="link"], [onclick], input[type="submit"], input[type="button"]';
-                    const elements = Array.from(document.querySelectorAll(clickableSelectors));
-                    element = elements.find(el => {
-                        const text = el.textContent.trim();
-                        const ariaLabel = el.getAttribute('aria-label') || '';
-                        return text === selector || text.includes(selector) || ariaLabel.includes(selector);
-                    });
-                    
-                    // If not found in clickable elements, try all elements
-                    if (!element) {
-                        const allElements = Array.from(document.querySelectorAll('*'));
-                        element = allElements.find(el => el.textContent.trim() === selector);
-                    }
-                }
-                
-                if (element) {
-                    element.scrollIntoView({behavior: 'smooth', block: 'center'});
-                    
-                    // Check if link already opens in new tab
-                    const alreadyOpensInNewTab = element.tagName === 'A' && 
-                        (element.target === '_blank' || element.rel?.includes('noopener'));
-                    
-                    // If it's a link and we want new tab behavior
-                    if (element.tagName === 'A' && openInNewTab && !alreadyOpensInNewTab) {
-                        // Modify the link to open in new tab
-                        const originalTarget = element.target;
-                        element.target = '_blank';
-                        element.rel = 'noopener noreferrer';
-                        
-                        // Click it
-                        element.dispatchEvent(new MouseEvent('mousedown', { bubbles: true }));
-                        element.dispatchEvent(new MouseEvent('mouseup', { bubbles: true }));
-                        element.click();
-                        element.dispatchEvent(new MouseEvent('click', { bubbles: true }));
-                        
-                        // Restore original target
-                        element.target = originalTarget;
-                        
-                        return {
-                            success: true,
-                            tagName: element.tagName,
-                            text: element.textContent.trim().substring(0, 50),
-                            openedInNewTab: true,
-                            wasModified: true
-                        };
-                    } else {
-                        // Normal click or already opens in new tab
-                        element.dispatchEvent(new MouseEvent('mousedown', { bubbles: true }));
-                        element.dispatchEvent(new MouseEvent('mouseup', { bubbles: true }));
-                        element.click();
-                        element.dispatchEvent(new MouseEvent('click', { bubbles: true }));
-                        
-                        return {
-                            success: true,
-                            tagName: element.tagName,
-                            text: element.textContent.trim().substring(0, 50),
-                            openedInNewTab: alreadyOpensInNewTab,
-                            wasModified: false
-                        };
-                    }
-                }
-                return { success: false, error: 'Element not found' };
-            }
-            """
-            result = await page.evaluate(js_code, {
+            result = await JavaScriptExecutor._call(page, "click", {
                 "selector": selector, 
                 "selectorType": selector_type,
                 "openInNewTab": open_in_new_tab
@@ -921,33 +1534,26 @@ class JavaScriptExecutor:
                     else:
                         new_tab_info = " [Already opens in new tab - no modification needed]"
                 logger.info(f"JavaScript click successful on '{selector}' ({result.get('tagName')}){new_tab_info}")
-                await page.wait_for_timeout(500)  # Brief wait for any JavaScript handlers
+                await network.settle(page, mark)
                 return True
             
             # Fallback: Try Playwright's native click
             logger.warning(f"JavaScript click didn't find element, trying Playwright native click")
             
             if selector_type == "text":
-                # Try to find by text using Playwright
+                # Try to find by text using Playwright: a button, a link or any text
+                # match, all under one timeout
                 try:
-                    # Try as button first
-                    await page.get_by_role("button", name=selector).click(timeout=2000)
-                    logger.info(f"Playwright click successful on button with text '{selector}'")
+                    locator = (
+                        page.get_by_role("button", name=selector)
+                        .or_(page.get_by_role("link", name=selector))
+                        .or_(page.get_by_text(selector, exact=False))
+                    )
+                    await locator.first.click(timeout=2000)
+                    logger.info(f"Playwright click successful on element with text '{selector}'")
                     return True
                 except:
-                    try:
-                        # Try as link
-                        await page.get_by_role("link", name=selector).click(timeout=2000)
-                        logger.info(f"Playwright click successful on link with text '{selector}'")
-                        return True
-                    except:
-                        try:
-                            # Try get_by_text
-                            await page.get_by_text(selector, exact=False).first.click(timeout=2000)
-                            logger.info(f"Playwright click successful using get_by_text '{selector}'")
-                            return True
-                        except:
-                            pass
+                    pass
             
             elif selector_type == "css":
                 try:
@@ -979,41 +1585,7 @@ class JavaScriptExecutor:
             True if successful, False otherwise
         """
         try:
-            js_code = """
-            (args) => {
-                const { selector, value, selectorType } = args;
-                let element = null;
-                
-                if (selectorType === 'css') {
-                    element = document.querySelector(selector);
-                } else if (selectorType === 'xpath') {
-                    element = document.evaluate(selector, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
-                } else if (selectorType === 'placeholder') {
-                    // Find input/textarea with matching placeholder (exact or partial match)
-                    const inputs = Array.from(document.querySelectorAll('input, textarea'));
-                    element = inputs.find(el => {
-                        const ph = el.getAttribute('placeholder');
-                        return ph && ph.includes(selector);
-                    });
-                } else if (selectorType === 'label') {
-                    const label = Array.from(document.querySelectorAll('label')).find(l => l.textContent.includes(selector));
-                    if (label) {
-                        element = document.getElementById(label.getAttribute('for')) || label.querySelector('input, textarea, select');
-                    }
-                }
-                
-                if (element) {
-                    element.scrollIntoView({behavior: 'smooth', block: 'center'});
-                    element.focus();
-                    element.value = value;
-                    element.dispatchEvent(new Event('input', { bubbles: true }));
-                    element.dispatchEvent(new Event('change', { bubbles: true }));
-                    return true;
-                }
-                return false;
-            }
-            """
-            result = await page.evaluate(js_code, {"selector": selector, "value": value, "selectorType": selector_type})
+            result = await JavaScriptExecutor._call(page, "fill", {"selector": selector, "value": value, "selectorType": selector_type})
             logger.debug(f"JavaScript fill '{selector}' with '{value}' ({selector_type}): {result}")
             return result
         except Exception as e:
@@ -1023,7 +1595,11 @@ class JavaScriptExecutor:
     @staticmethod
     async def press_key(page: Page, key: str) -> bool:
         """
-        Press a keyboard key using JavaScript.
+        Press a keyboard key.
+        
+        Named keys and single characters go straight to the browser's input
+        pipeline over CDP, so they are trusted events (Enter submits forms);
+        anything else is dispatched as a synthetic event in JavaScript.
         
         Args:
             page: The Playwright page object
@@ -1032,33 +1608,16 @@ class JavaScriptExecutor:
         Returns:
             True if successful, False otherwise
         """
+        event = JavaScriptExecutor._KEY_EVENTS.get(key) or ({"code": "", "text": key} if len(key) == 1 else None)
         try:
-            js_code = """
-            (args) => {
-                const { key } = args;
-                const activeElement = document.activeElement;
-                if (activeElement) {
-                    const event = new KeyboardEvent('keydown', {
-                        key: key,
-                        code: key,
-                        bubbles: true,
-                        cancelable: true
-                    });
-                    activeElement.dispatchEvent(event);
-                    
-                    const keyupEvent = new KeyboardEvent('keyup', {
-                        key: key,
-                        code: key,
-                        bubbles: true,
-                        cancelable: true
-                    });
-                    activeElement.dispatchEvent(keyupEvent);
-                    return true;
-                }
-                return false;
-            }
-            """
-            result = await page.evaluate(js_code, {"key": key})
+            if event is not None:
+                cdp = await JavaScriptExecutor._cdp(page)
+                await cdp.send("Input.dispatchKeyEvent", {"type": "keyDown" if "text" in event else "rawKeyDown", "key": key, **event})
+                await cdp.send("Input.dispatchKeyEvent", {"type": "keyUp", "key": key, **event})
+                logger.debug(f"Key press '{key}' dispatched over CDP")
+                return True
+            
+            result = await JavaScriptExecutor._call(page, "press", {"key": key})
             logger.debug(f"JavaScript key press '{key}': {result}")
             return result
         except Exception as e:
@@ -1080,33 +1639,7 @@ class JavaScriptExecutor:
             True if element found, False otherwise
         """
         try:
-            js_code = """
-            (args) => {
-                const { selector, selectorType, timeout } = args;
-                return new Promise((resolve) => {
-                    const startTime = Date.now();
-                    const interval = setInterval(() => {
-                        let element = null;
-                        
-                        if (selectorType === 'css') {
-                            element = document.querySelector(selector);
-                        } else if (selectorType === 'text') {
-                            const elements = Array.from(document.querySelectorAll('*'));
-                            element = elements.find(el => el.textContent.trim().includes(selector));
-                        }
-                        
-                        if (element) {
-                            clearInterval(interval);
-                            resolve(true);
-                        } else if (Date.now() - startTime > timeout) {
-                            clearInterval(interval);
-                            resolve(false);
-                        }
-                    }, 100);
-                });
-            }
-            """
-            result = await page.evaluate(js_code, {"selector": selector, "selectorType": selector_type, "timeout": timeout})
+            result = await JavaScriptExecutor._call(page, "waitFor", {"selector": selector, "selectorType": selector_type, "timeout": timeout})
             logger.debug(f"JavaScript wait for '{selector}' ({selector_type}): {result}")
             return result
         except Exception as e:
@@ -1127,36 +1660,7 @@ class JavaScriptExecutor:
             Dictionary with element info or None
         """
         try:
-            js_code = """
-            (args) => {
-                const { selector, selectorType } = args;
-                let element = null;
-                
-                if (selectorType === 'css') {
-                    element = document.querySelector(selector);
-                } else if (selectorType === 'text') {
-                    const elements = Array.from(document.querySelectorAll('*'));
-                    element = elements.find(el => el.textContent.trim().includes(selector));
-                }
-                
-                if (element) {
-                    const rect = element.getBoundingClientRect();
-                    return {
-                        tagName: element.tagName,
-                        text: element.textContent.trim(),
-                        value: element.value || null,
-                        visible: rect.width > 0 && rect.height > 0,
-                        enabled: !element.disabled,
-                        x: rect.x,
-                        y: rect.y,
-                        width: rect.width,
-                        height: rect.height
-                    };
-                }
-                return null;
-            }
-            """
-            result = await page.evaluate(js_code, {"selector": selector, "selectorType": selector_type})
+            result = await JavaScriptExecutor._call(page, "info", {"selector": selector, "selectorType": selector_type})
             logger.debug(f"JavaScript element info for '{selector}': {result}")
             return result
         except Exception as e:
@@ -1164,14 +1668,82 @@ class JavaScriptExecutor:
             return None
 
 
+# A parsed command: (attribute, call arguments or None for plain attribute access) steps
+# starting from `page`. Arguments are ('value', literal) or ('page', nested steps).
+CommandSteps = Tuple[Tuple[str, Optional[Tuple[tuple, tuple]]], ...]
+
+
+@lru_cache(maxsize=1024)
+def _parse_command(command: str) -> CommandSteps:
+    """
+    Parse a command once into the calls it makes on `page`; LLMs repeat the same commands a lot.
+    
+    Raises:
+        ValueError: If the command is anything but attribute accesses and calls
+            chained on `page`, with literal or `page.…` arguments
+    """
+    try:
+        tree = ast.parse(command, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Invalid command syntax: {e.msg}") from None
+    return _parse_chain(tree.body)
+
+
+def _parse_chain(node: ast.AST) -> CommandSteps:
+    """Unwind `page.a(...).b.c(...)` into its steps, innermost first."""
+    steps = []
+    while not (isinstance(node, ast.Name) and node.id == 'page'):
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            if any(keyword.arg is None for keyword in node.keywords):
+                raise ValueError("**kwargs are not allowed in commands")
+            args = tuple(_parse_argument(arg) for arg in node.args)
+            kwargs = tuple((keyword.arg, _parse_argument(keyword.value)) for keyword in node.keywords)
+            steps.append((node.func.attr, (args, kwargs)))
+            node = node.func.value
+        elif isinstance(node, ast.Attribute):
+            steps.append((node.attr, None))
+            node = node.value
+        else:
+            raise ValueError(f"Commands may only use the page object, got: {ast.unparse(node)}")
+    
+    steps.reverse()
+    if not steps:
+        raise ValueError("Command must call a method on page")
+    for attr, _ in steps:
+        if attr.startswith('_'):
+            raise ValueError(f"Private attribute '{attr}' is not allowed")
+    return tuple(steps)
+
+
+def _parse_argument(node: ast.AST) -> tuple:
+    if isinstance(node, (ast.Call, ast.Attribute)):
+        return ('page', _parse_chain(node))
+    try:
+        return ('value', ast.literal_eval(node))
+    except ValueError:
+        raise ValueError(f"Unsupported argument: {ast.unparse(node)}") from None
+
+
 class CommandExecutor:
     """Safely executes Playwright commands."""
     
+    # Only these may be the first attribute used on page
+    ALLOWED_METHODS = frozenset({
+        'goto', 'click', 'fill', 'press', 'wait_for_timeout',
+        'wait_for_load_state', 'wait_for_selector', 'get_by_role',
+        'get_by_text', 'get_by_label', 'locator', 'keyboard',
+        'wait_for', 'is_visible', 'is_enabled', 'count',
+        'first', 'last', 'nth', 'filter', 'accessibility'
+    })
+    
     @staticmethod
     async def execute(page: Page, command: str) -> None:
         """
         Execute a Playwright command safely.
         
+        The command is parsed (once per distinct string) into its chain of calls on
+        `page`, which are then made directly; nothing is evaluated.
+        
         Args:
             page: The Playwright page object
             command: The command string to execute
@@ -1182,49 +1754,53 @@ class CommandExecutor:
         """
         command = command.strip()
         
-        # Security check: only allow specific Playwright methods
-        allowed_methods = [
-            'goto', 'click', 'fill', 'press', 'wait_for_timeout', 
-            'wait_for_load_state', 'wait_for_selector', 'get_by_role',
-            'get_by_text', 'get_by_label', 'locator', 'keyboard',
-            'wait_for', 'is_visible', 'is_enabled', 'count',
-            'first', 'last', 'nth', 'filter', 'accessibility'
-        ]
-        
         # Check if command starts with 'page.'
         if not command.startswith('page.'):
             raise ValueError(f"Command must start with 'page.': {command}")
         
-        # Extract the method name
-        method_name = command.split('(')[0].split('.')[1] if '.' in command else None
-        if not method_name or method_name not in allowed_methods:
-            raise ValueError(f"Method '{method_name}' is not allowed")
+        steps = _parse_command(command)
         
-        # Create safe execution environment
-        safe_globals = {
-            'page': page,
-            '__builtins__': {
-                'True': True,
-                'False': False,
-                'None': None,
-                'str': str,
-                'int': int,
-                'float': float,
-                'bool': bool,
-            }
-        }
+        # Security check: only allow specific Playwright methods
+        method_name = steps[0][0]
+        if method_name not in CommandExecutor.ALLOWED_METHODS:
+            raise ValueError(f"Method '{method_name}' is not allowed")
         
         try:
-            await eval(command, safe_globals, {})
+            result = CommandExecutor._run_steps(page, steps)
+            if inspect.isawaitable(result):
+                await result
             logger.debug(f"Successfully executed: {command}")
         except Exception as e:
             logger.error(f"Failed to execute command '{command}': {e}")
             raise
+    
+    @staticmethod
+    def _run_steps(page: Page, steps: CommandSteps) -> Any:
+        target = page
+        for attr, call in steps:
+            target = getattr(target, attr)
+            if call is not None:
+                args, kwargs = call
+                target = target(
+                    *(CommandExecutor._resolve_argument(page, arg) for arg in args),
+                    **{name: CommandExecutor._resolve_argument(page, arg) for name, arg in kwargs}
+                )
+        return target
+    
+    @staticmethod
+    def _resolve_argument(page: Page, argument: tuple) -> Any:
+        kind, value = argument
+        return CommandExecutor._run_steps(page, value) if kind == 'page' else value
 
 
 class ResponseParser:
     """Parse LLM responses into commands and next steps."""
     
+    @staticmethod
+    def _non_empty_lines(response: str) -> Iterator[str]:
+        """Lazily yield the stripped non-empty lines, so parsers stop reading where they stop needing them."""
+        return (stripped for line in response.splitlines() if (stripped := line.strip()))
+    
     @staticmethod
     def parse_response(response: str) -> tuple[Optional[str], Optional[str], bool]:
         """
@@ -1237,25 +1813,24 @@ class ResponseParser:
             Tuple of (command, next_action, is_completed)
         """
         try:
-            lines = [line.strip() for line in response.split('\n') if line.strip()]
+            lines = ResponseParser._non_empty_lines(response)
+            first_line = next(lines, None)
             
-            if not lines:
+            if first_line is None:
                 logger.warning("Empty response from LLM")
                 return None, None, False
             
             # Check for completion marker
-            first_line = lines[0]
             if '#completed' in first_line.lower() or 'print(\'#completed\')' in first_line.lower():
                 logger.info("Task marked as completed")
                 return None, None, True
             
             # Parse command and next action
             command_line = first_line
-            next_command = lines[1] if len(lines) > 1 else "Continue with the task"
+            next_command = next(lines, "Continue with the task")
             
-            # Remove 'await' keyword if present
-            if 'await' in command_line:
-                command_line = command_line.replace('await', '').strip()
+            # Remove leading 'await' keyword if present (without touching identifiers that contain it)
+            command_line = command_line.removeprefix('await ').lstrip()
             
             return command_line, next_command, False
             
@@ -1264,56 +1839,92 @@ class ResponseParser:
             return None, None, False
     
     @staticmethod
-    def parse_javascript_response(response: str) -> tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+    def parse_javascript_response(response: str, max_commands: int = 1) -> tuple[List[Dict[str, Any]], Optional[str], bool]:
         """
-        Parse JavaScript-based LLM response into command dict and next action.
+        Parse JavaScript-based LLM response into command dicts and next action.
+        
+        Leading JSON lines are commands (extra ones past max_commands are dropped);
+        the first line after them is the next action.
         
         Args:
-            response: Raw LLM response text with JSON command
+            response: Raw LLM response text with JSON commands
+            max_commands: Maximum number of commands to take from one response
             
         Returns:
-            Tuple of (command_dict, next_action, is_completed)
+            Tuple of (command_dicts, next_action, is_completed)
         """
         try:
-            lines = [line.strip() for line in response.split('\n') if line.strip()]
-            
-            if not lines:
+            if not response or response.isspace():
                 logger.warning("Empty response from LLM")
-                return None, None, False
+                return [], None, False
             
-            # Parse JSON command from first line
-            first_line = lines[0]
+            # Stripped once per line, and only up to the next action
+            lines = ResponseParser._non_empty_lines(response)
             
-            # Try to extract JSON
-            try:
-                # Remove markdown code blocks if present
-                if '```' in first_line:
-                    first_line = first_line.replace('```json', '').replace('```', '').strip()
+            commands = []
+            next_command = "Continue with the task"
+            
+            for line in lines:
+                # Remove markdown code fences if present (only at the ends, so
+                # backticks inside a JSON string survive)
+                if '```' in line:
+                    line = line.removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+                    if not line:
+                        continue
+                
+                # First non-JSON line after the commands is the next action
+                if commands and not line.startswith('{'):
+                    next_command = line
+                    break
+                
+                if len(commands) >= max_commands:
+                    continue
                 
-                command_dict = json.loads(first_line)
+                try:
+                    command_dict = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    logger.error(f"Failed to parse JSON command: {e}. Response: {line}")
+                    if not commands:
+                        return [], None, False
+                    break
                 
                 # Check if completed
                 if command_dict.get('action') == 'completed':
                     logger.info("Task marked as completed")
-                    return command_dict, None, True
-                
-                # Get next action
-                next_command = lines[1] if len(lines) > 1 else "Continue with the task"
+                    return commands, None, True
                 
-                return command_dict, next_command, False
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON command: {e}. Response: {first_line}")
-                return None, None, False
+                commands.append(command_dict)
+            
+            return commands, next_command, False
             
         except Exception as e:
             logger.error(f"Error parsing JavaScript response: {e}")
-            return None, None, False
+            return [], None, False
 
 
 class JavaScriptCommandExecutor:
     """Executes JSON-based JavaScript commands."""
     
+    # Read-only probes; consecutive ones in a batch can run concurrently
+    PARALLEL_SAFE_ACTIONS = frozenset({'wait_element', 'get_tabs'})
+    
+    @staticmethod
+    def group_commands(commands: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Split a command batch into groups that can each be awaited together.
+        
+        Consecutive read-only probes share a group; every other command runs alone
+        so actions keep their order.
+        """
+        safe = JavaScriptCommandExecutor.PARALLEL_SAFE_ACTIONS
+        groups: List[List[Dict[str, Any]]] = []
+        for command_dict in commands:
+            if groups and command_dict.get('action') in safe and groups[-1][0].get('action') in safe:
+                groups[-1].append(command_dict)
+            else:
+                groups.append([command_dict])
+        return groups
+    
     @staticmethod
     async def execute_command(page: Page, command_dict: Dict[str, Any], session: Optional['Session'] = None) -> bool:
         """
@@ -1327,134 +1938,311 @@ class JavaScriptCommandExecutor:
             True if successful, False otherwise
         """
         action = command_dict.get('action')
+        handler = _ACTION_HANDLERS.get(action) if isinstance(action, str) else None
+        if handler is None:
+            logger.error(f"Unknown action: {action}")
+            return False
         
         try:
-            if action == 'goto':
-                url = command_dict.get('value', '')
-                await page.goto(url)
-                logger.info(f"Navigated to: {url}")
-                return True
-            
-            elif action == 'click':
-                selector = command_dict.get('selector', '')
-                selector_type = command_dict.get('selector_type', 'css')
-                open_in_new_tab = command_dict.get('open_in_new_tab', False)
-                result = await JavaScriptExecutor.click_element(page, selector, selector_type, open_in_new_tab)
-                if result:
-                    logger.info(f"Clicked element: {selector} ({selector_type})")
-                return result
-            
-            elif action == 'fill':
-                selector = command_dict.get('selector', '')
-                selector_type = command_dict.get('selector_type', 'css')
-                value = command_dict.get('value', '')
-                result = await JavaScriptExecutor.fill_input(page, selector, value, selector_type)
-                if result:
-                    logger.info(f"Filled {selector} with value ({selector_type})")
-                return result
-            
-            elif action == 'select':
-                # Select option in dropdown
-                selector = command_dict.get('selector', '')
-                selector_type = command_dict.get('selector_type', 'css')
-                value = command_dict.get('value', '')
-                result = await JavaScriptExecutor.select_dropdown(page, selector, value, selector_type)
-                if result:
-                    logger.info(f"Selected '{value}' in dropdown {selector} ({selector_type})")
-                return result
-            
-            elif action == 'press_key':
-                key = command_dict.get('value', 'Enter')
-                result = await JavaScriptExecutor.press_key(page, key)
-                if result:
-                    logger.info(f"Pressed key: {key}")
-                return result
-            
-            elif action == 'wait':
-                timeout = command_dict.get('timeout', 2000)
-                await page.wait_for_timeout(timeout)
-                logger.info(f"Waited for {timeout}ms")
-                return True
-            
-            elif action == 'wait_element':
-                selector = command_dict.get('selector', '')
-                selector_type = command_dict.get('selector_type', 'css')
-                timeout = command_dict.get('timeout', 5000)
-                result = await JavaScriptExecutor.wait_for_element(page, selector, selector_type, timeout)
-                if result:
-                    logger.info(f"Element found: {selector} ({selector_type})")
-                else:
-                    logger.warning(f"Element not found after {timeout}ms: {selector}")
-                return result
-            
-            elif action == 'get_tabs':
-                # Get list of all open tabs
-                if session:
-                    tabs = await TabManager.get_all_pages(session)
-                    logger.info(f"Retrieved {len(tabs)} tabs")
-                    return True
-                return False
-            
-            elif action == 'switch_tab':
-                # Switch to a specific tab
-                tab_index = command_dict.get('tab_index', 0)
-                if session:
-                    result = await TabManager.switch_to_tab(session, tab_index)
-                    if result:
-                        logger.info(f"Switched to tab {tab_index}")
-                    return result
-                return False
-            
-            elif action == 'close_tab':
-                # Close a specific tab or current tab
-                tab_index = command_dict.get('tab_index')  # None = current tab
-                if session:
-                    result = await TabManager.close_tab(session, tab_index)
-                    if result:
-                        logger.info(f"Closed tab {tab_index if tab_index is not None else 'current'}")
-                    return result
-                return False
-            
-            elif action == 'close_other_tabs':
-                # Close all tabs except current
-                if session:
-                    count = await TabManager.close_other_tabs(session)
-                    logger.info(f"Closed {count} other tabs")
-                    return True
-                return False
-            
-            elif action == 'completed':
-                logger.info("Task completed")
-                return True
-            
-            else:
-                logger.error(f"Unknown action: {action}")
-                return False
-                
+            return await handler(page, command_dict, session)
         except Exception as e:
             logger.error(f"Error executing JavaScript command: {e}")
             return False
+    
+    @staticmethod
+    async def _goto(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        url = command_dict.get('value', '')
+        await page.goto(url)
+        logger.info(f"Navigated to: {url}")
+        return True
+    
+    @staticmethod
+    async def _click(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        selector = command_dict.get('selector', '')
+        selector_type = command_dict.get('selector_type', 'css')
+        open_in_new_tab = command_dict.get('open_in_new_tab', False)
+        result = await JavaScriptExecutor.click_element(page, selector, selector_type, open_in_new_tab)
+        if result:
+            logger.info(f"Clicked element: {selector} ({selector_type})")
+        return result
+    
+    @staticmethod
+    async def _fill(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        selector = command_dict.get('selector', '')
+        selector_type = command_dict.get('selector_type', 'css')
+        value = command_dict.get('value', '')
+        result = await JavaScriptExecutor.fill_input(page, selector, value, selector_type)
+        if result:
+            logger.info(f"Filled {selector} with value ({selector_type})")
+        return result
+    
+    @staticmethod
+    async def _select(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        # Select option in dropdown
+        selector = command_dict.get('selector', '')
+        selector_type = command_dict.get('selector_type', 'css')
+        value = command_dict.get('value', '')
+        result = await JavaScriptExecutor.select_dropdown(page, selector, value, selector_type)
+        if result:
+            logger.info(f"Selected '{value}' in dropdown {selector} ({selector_type})")
+        return result
+    
+    @staticmethod
+    async def _press_key(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        key = command_dict.get('value', 'Enter')
+        result = await JavaScriptExecutor.press_key(page, key)
+        if result:
+            logger.info(f"Pressed key: {key}")
+        return result
+    
+    @staticmethod
+    async def _wait(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        timeout = command_dict.get('timeout', 2000)
+        condition = command_dict.get('condition')
+        if condition in ('load', 'domcontentloaded', 'networkidle'):
+            # Wait for the page state itself, with the timeout as an upper bound
+            try:
+                await page.wait_for_load_state(condition, timeout=timeout)
+                logger.info(f"Page reached '{condition}'")
+            except Exception:
+                logger.info(f"Page did not reach '{condition}' within {timeout}ms")
+            return True
+        await page.wait_for_timeout(timeout)
+        logger.info(f"Waited for {timeout}ms")
+        return True
+    
+    @staticmethod
+    async def _wait_element(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        selector = command_dict.get('selector', '')
+        selector_type = command_dict.get('selector_type', 'css')
+        timeout = command_dict.get('timeout', 5000)
+        result = await JavaScriptExecutor.wait_for_element(page, selector, selector_type, timeout)
+        if result:
+            logger.info(f"Element found: {selector} ({selector_type})")
+        else:
+            logger.warning(f"Element not found after {timeout}ms: {selector}")
+        return result
+    
+    @staticmethod
+    async def _get_tabs(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        # Get list of all open tabs
+        if session:
+            tabs = await TabManager.get_all_pages(session)
+            logger.info(f"Retrieved {len(tabs)} tabs")
+            return True
+        return False
+    
+    @staticmethod
+    async def _switch_tab(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        # Switch to a specific tab
+        tab_index = command_dict.get('tab_index', 0)
+        if session:
+            result = await TabManager.switch_to_tab(session, tab_index)
+            if result:
+                logger.info(f"Switched to tab {tab_index}")
+            return result
+        return False
+    
+    @staticmethod
+    async def _close_tab(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        # Close a specific tab or current tab
+        tab_index = command_dict.get('tab_index')  # None = current tab
+        if session:
+            result = await TabManager.close_tab(session, tab_index)
+            if result:
+                logger.info(f"Closed tab {tab_index if tab_index is not None else 'current'}")
+            return result
+        return False
+    
+    @staticmethod
+    async def _close_other_tabs(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        # Close all tabs except current
+        if session:
+            count = await TabManager.close_other_tabs(session)
+            logger.info(f"Closed {count} other tabs")
+            return True
+        return False
+    
+    @staticmethod
+    async def _chain(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        steps = command_dict.get('steps') or []
+        if not isinstance(steps, list) or not steps:
+            logger.error("Chain command has no steps")
+            return False
+        return await JavaScriptExecutor.run_chain(page, steps)
+    
+    @staticmethod
+    async def _completed(page: Page, command_dict: Dict[str, Any], session: Optional['Session']) -> bool:
+        logger.info("Task completed")
+        return True
+
+
+# JSON command action -> handler, so dispatch is one dict lookup
+_ACTION_HANDLERS: Dict[str, Callable[[Page, Dict[str, Any], Optional['Session']], Awaitable[bool]]] = {
+    'goto': JavaScriptCommandExecutor._goto,
+    'click': JavaScriptCommandExecutor._click,
+    'fill': JavaScriptCommandExecutor._fill,
+    'select': JavaScriptCommandExecutor._select,
+    'press_key': JavaScriptCommandExecutor._press_key,
+    'wait': JavaScriptCommandExecutor._wait,
+    'wait_element': JavaScriptCommandExecutor._wait_element,
+    'get_tabs': JavaScriptCommandExecutor._get_tabs,
+    'switch_tab': JavaScriptCommandExecutor._switch_tab,
+    'close_tab': JavaScriptCommandExecutor._close_tab,
+    'close_other_tabs': JavaScriptCommandExecutor._close_other_tabs,
+    'chain': JavaScriptCommandExecutor._chain,
+    'completed': JavaScriptCommandExecutor._completed,
+}
+
+
+class StreamedCommand:
+    """
+    Starts the first command of an LLM response as soon as its line has streamed,
+    so it runs while the rest of the response is still being generated.
+    """
+    
+    def __init__(self, page: Page, session: 'Session', settle: Optional[asyncio.Task]):
+        self.page = page
+        self.session = session
+        self.settle = settle  # The previous step's page settle wait
+        self.command: Any = None  # Command string, or command dict in JavaScript mode
+        self.task: Optional[asyncio.Task] = None
+        self._seen_first_line = False
+    
+    def on_line(self, line: str):
+        """Stream callback; acts on the first line only."""
+        if self._seen_first_line:
+            return
+        self._seen_first_line = True
+        
+        if self.session.use_javascript:
+            commands, _, _ = ResponseParser.parse_javascript_response(line)
+            if commands:
+                self.command = commands[0]
+        else:
+            command_line, _, is_completed = ResponseParser.parse_response(line)
+            if command_line and not is_completed:
+                self.command = command_line
+        
+        if self.command is not None:
+            self.task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        if self.settle is not None:
+            # Shielded: cancelling this command must not cancel the loop's settle task
+            await asyncio.shield(self.settle)
+        if self.session.use_javascript:
+            return await JavaScriptCommandExecutor.execute_command(self.page, self.command, self.session)
+        await CommandExecutor.execute(self.page, self.command)
+    
+    async def finish(self) -> Optional[str]:
+        """
+        Let a started command run to the end after the rest of its response was lost.
+        
+        Returns:
+            The command as recorded in the session history if it succeeded, else None
+        """
+        try:
+            result = await self.task
+        except Exception as e:
+            logger.error(f"Streamed command failed: {e}")
+            return None
+        if self.session.use_javascript:
+            return orjson.dumps(self.command).decode() if result else None
+        return self.command
+    
+    def cancel(self):
+        """Abandon the command when the response it came from is not used."""
+        if self.task is None:
+            return
+        if self.task.done():
+            if not self.task.cancelled():
+                self.task.exception()  # Mark retrieved so asyncio doesn't log it
+        else:
+            self.task.cancel()
+
+
+def is_retryable_llm_error(error: Exception) -> bool:
+    """
+    Tell transient provider failures from ones a retry cannot fix.
+    
+    Args:
+        error: Exception raised by the LLM backend
+        
+    Returns:
+        True for throttling (429), server errors (5xx) and network failures
+    """
+    # openai errors carry status_code, google-genai errors carry code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    # Connection failures and timeouts carry no status; openai wraps them in its own types
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)) \
+        or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def disable_playwright_stack_capture():
+    """
+    Stop Playwright from calling inspect.stack() on every API call.
+    
+    The stack only feeds trace and error metadata, yet walking it is the largest
+    Python cost of each call. The affected Playwright modules get a copy of
+    `inspect` whose stack() is empty; the real module is left alone.
+    """
+    import importlib
+    no_stack = type(sys)("inspect")
+    no_stack.__dict__.update(vars(inspect))
+    no_stack.stack = lambda *args, **kwargs: []
+    for name in ("playwright._impl._connection", "playwright._impl._async_base", "playwright._impl._api_types"):
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue  # Not present in every Playwright version
+        if getattr(module, "inspect", None) is inspect:
+            module.inspect = no_stack
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events for the FastAPI app."""
     global _browser
-    async with async_playwright() as playwright:
-        _browser = await playwright.chromium.launch(
-            headless=config.HEADLESS, 
-            timeout=config.BROWSER_TIMEOUT
-        )
-        # Start session cleanup task
-        cleanup_task = asyncio.create_task(session_manager.cleanup_expired_sessions())
-        logger.info("Browser automation system started")
-        yield
-        # Cleanup
-        cleanup_task.cancel()
-        await _browser.close()
-        logger.info("Browser automation system stopped")
-    
-app = FastAPI(lifespan=lifespan)
+    if not config.PLAYWRIGHT_STACK_TRACES:
+        disable_playwright_stack_capture()
+    # Pre-establish the LLM connection so the first /interact skips the handshake;
+    # it doesn't need the browser, so it runs while Chromium starts
+    llm_warmup = asyncio.create_task(warmup_llm())
+    try:
+        async with async_playwright() as playwright:
+            _browser = await playwright.chromium.launch(
+                headless=config.HEADLESS, 
+                timeout=config.BROWSER_TIMEOUT
+            )
+            await context_pool.start(_browser)
+            try:
+                await llm_warmup
+            except Exception as e:
+                logger.warning(f"LLM connection warmup failed: {e}")
+            # Start session cleanup task
+            cleanup_task = asyncio.create_task(session_manager.cleanup_expired_sessions())
+            logger.info("Browser automation system started")
+            yield
+            # Cleanup
+            cleanup_task.cancel()
+            await asyncio.gather(cleanup_task, return_exceptions=True)
+            await asyncio.gather(*(session_manager.close_session(session_id) for session_id in list(session_manager.sessions)))
+            await context_pool.close()
+            await _browser.close()
+            logger.info("Browser automation system stopped")
+    finally:
+        # A no-op once awaited above; if startup failed first, stop the warmup
+        # rather than leave its exception unretrieved
+        llm_warmup.cancel()
+        await asyncio.gather(llm_warmup, return_exceptions=True)
+    
+# Responses are encoded with orjson, which matters for /sessions and long command lists
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+# Command lists and session listings compress well; small bodies aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 _browser = None
 
@@ -1478,8 +2266,12 @@ async def start_session(request: StartSessionRequest = StartSessionRequest()):
         --data '{"mode":"interact"}'
     """
     try:
-        session_id = session_manager.create_session()
-        session = session_manager.get_session(session_id)
+        try:
+            session_id = await session_manager.create_session(request.storage_key)
+        except asyncio.TimeoutError:
+            logger.warning("No browser context available for a new session")
+            raise HTTPException(status_code=503, detail="All browser contexts are in use, try again later")
+        session = session_manager.get_session(session_id, touch=False)  # Just created
         
         if request.mode == ModeEnum.INTERACT:
             # Choose prompt based on configuration
@@ -1492,11 +2284,13 @@ async def start_session(request: StartSessionRequest = StartSessionRequest()):
                 session.use_javascript = False
                 logger.info(f"Initialized LLM with Playwright commands for session {session_id}")
         
-        return StartSessionResponse(
+        return StartSessionResponse.model_construct(
             session_id=session_id,
             mode=request.mode,
             created_at=session.created_at
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating session: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to create session: {str(e)}")
@@ -1519,8 +2313,6 @@ async def interact_command(session_id: str, request: InteractRequest):
         --header 'content-type: application/json' \
         --data '{"message":"log in into twitter.com with username <username> and password <password>"}'
     """
-    start_time = time.time()
-    
     # Validate session
     session = session_manager.get_session(session_id)
     if not session:
@@ -1530,26 +2322,78 @@ async def interact_command(session_id: str, request: InteractRequest):
             detail=f"Session {session_id} not found. Please create a session first."
         )
     
-    # Initialize browser context and page if needed
-    if not session.browser_context:
-        try:
-            session.browser_context = await _browser.new_context()
-            logger.info(f"Created new browser context for session {session_id}")
-        except Exception as e:
-            logger.error(f"Failed to create browser context: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to create browser context: {str(e)}")
+    # Busy sessions are never evicted to make room for new ones
+    session.in_flight += 1
+    try:
+        return await _run_interaction(session_id, session, request.message)
+    finally:
+        session.in_flight -= 1
+
+
+async def _build_step_message(session: Session, page: Page, goal_header: str, next_command: str) -> str:
+    """Describe the page a step left behind, for the LLM message that picks the next step."""
+    # Get tab information and detailed page elements; they don't depend on
+    # each other, so both round-trips run at once. Tabs are only listed when
+    # there are several, so a single tracked page skips fetching titles
+    tabs, page_elements = await asyncio.gather(
+        TabManager.get_all_pages(session) if len(session.all_pages) > 1 else asyncio.sleep(0, None),
+        DOMInspector.get_page_elements(page),
+        return_exceptions=True
+    )
+    
+    tab_info = ""
+    if isinstance(tabs, Exception):
+        logger.warning(f"Failed to get tab info: {tabs}")
+    elif tabs and len(tabs) > 1:
+        tab_info = f"\n\n**Open Tabs ({len(tabs)} total)**\n"
+        for tab in tabs:
+            current_marker = " ← CURRENT TAB" if tab['is_current'] else ""
+            tab_info += f"[Tab {tab['index']}] {tab['title']} - {tab['url'][:80]}{current_marker}\n"
+    
+    if isinstance(page_elements, Exception):
+        logger.warning(f"Failed to get page elements: {page_elements}")
+        page_elements = "Failed to extract page elements."
+    else:
+        # Only the part sent to the LLM is worth keeping around
+        page_elements = page_elements[:config.PAGE_SNAPSHOT_MAX_CHARS]
+    
+    # A list the LLM was just sent is replaced by a note (an identity check when
+    # DOMInspector reused its output); it is resent every few repeats so it never
+    # drops out of the LLM's history
+    if page_elements == session.page_snapshot and session.unchanged_snapshots < config.MAX_UNCHANGED_SNAPSHOTS:
+        session.unchanged_snapshots += 1
+        elements_section = "Unchanged since the previous step."
+    else:
+        session.unchanged_snapshots = 0
+        elements_section = page_elements
+    session.page_snapshot = page_elements
+    
+    # Build next user message with actual page structure
+    return "".join([
+        goal_header,
+        tab_info,  # Add tab info if multiple tabs
+        f"\n\n**Current Page Elements**\n{elements_section}",
+        f"\n\n**Next Goal**\n{next_command}",
+        "\n\n**Commands Executed (last 5)**\n",
+        "\n".join(session.recent_commands),
+    ])
+
+
+async def _run_interaction(session_id: str, session: Session, user_message: str) -> InteractResponse:
+    """Drive the LLM/browser loop for one /interact request until the goal is done or retries run out."""
+    start_time = time.time()
     
+    # Initialize the page on first use; the session got its context in create_session
     if not session.page:
         try:
             session.page = await session.browser_context.new_page()
-            session.all_pages.append(session.page)
+            session.track_page(session.page)
             logger.info(f"Created new page for session {session_id}")
             
             # Listen for new pages (popups/new tabs) with deduplication
             def handle_popup(popup):
-                # Check if this page is already tracked (prevent duplicates)
-                if popup not in session.all_pages:
-                    session.all_pages.append(popup)
+                # Already tracked pages are skipped (prevents duplicates)
+                if session.track_page(popup):
                     logger.info(f"New tab/popup detected: {popup.url}")
                     
                     # Set up listener for when the page loads
@@ -1560,8 +2404,11 @@ async def interact_command(session_id: str, request: InteractRequest):
                         except Exception as e:
                             logger.debug(f"Tab load timeout: {e}")
                     
-                    # Start load listener without blocking
-                    asyncio.create_task(on_load())
+                    # Start load listener without blocking; the session holds the task
+                    # until it finishes so it can't be collected or outlive the session
+                    task = asyncio.create_task(on_load())
+                    session.popup_tasks.add(task)
+                    task.add_done_callback(session.popup_tasks.discard)
             
             session.browser_context.on("page", handle_popup)
             
@@ -1574,8 +2421,7 @@ async def interact_command(session_id: str, request: InteractRequest):
         raise HTTPException(status_code=400, detail="Session not properly initialized with LLM")
     
     page = session.page
-    user_message = request.message
-    goal = user_message
+    goal_header = f"**Final Goal**\n{user_message}"  # Built once; leads every step's message
     
     # Reset session state for new interaction
     session.action_done = False
@@ -1583,138 +2429,224 @@ async def interact_command(session_id: str, request: InteractRequest):
     
     logger.info(f"Starting interaction for session {session_id}: {user_message[:100]}...")
     
-    while not session.action_done and session.retry_count < config.MAX_RETRIES:
-        try:
-            # Get LLM response
-            response = session.llm.generate_response(user_message)
-            logger.debug(f"LLM Response: {response}")
-            
-            # Parse and execute based on mode
-            if session.use_javascript:
-                # JavaScript execution mode
-                command_dict, next_command, is_completed = ResponseParser.parse_javascript_response(response)
-                
-                if is_completed:
-                    session.action_done = True
-                    logger.info(f"Task completed for session {session_id}")
-                    break
-                
-                if not command_dict:
-                    logger.warning("No valid JSON command extracted from LLM response")
+    # Page settle wait for the previous step, run while the next LLM call is in flight
+    settle: Optional[asyncio.Task] = None
+    network = NetworkWatch.for_page(page)
+    
+    try:
+        while not session.action_done and session.retry_count < config.MAX_RETRIES:
+            if session.closed:
+                # Closed or evicted mid-task; its pages are gone, so stop paying for LLM calls
+                break
+            try:
+                # Taken before the LLM call, since the first command can start while it streams
+                step_mark = network.mark()
+                # Get LLM response (only the command and next-step lines are used)
+                max_lines = config.MAX_BATCHED_COMMANDS + 1 if session.use_javascript else 2
+                streamed = StreamedCommand(page, session, settle)
+                try:
+                    response = await session.llm.generate_response(
+                        user_message, max_lines=max_lines, on_line=streamed.on_line
+                    )
+                except Exception as e:
+                    if not is_retryable_llm_error(e):
+                        streamed.cancel()
+                        logger.error(f"LLM request failed permanently: {e}")
+                        execution_time = time.time() - start_time
+                        return InteractResponse.model_construct(
+                            status="failure",
+                            session_id=session_id,
+                            commands_executed=list(session.commands_executed),
+                            error=f"LLM request failed: {e}",
+                            code=502,
+                            execution_time_seconds=round(execution_time, 2)
+                        )
+                    # Throttled or unavailable: back off, then re-prompt
                     session.retry_count += 1
-                    user_message = "No valid JSON command was generated. Please provide a valid JSON command in the format specified."
+                    backoff = min(2 ** session.retry_count + random.random(), config.MAX_BACKOFF_SECONDS)
+                    logger.warning(f"LLM request failed (attempt {session.retry_count}/{config.MAX_RETRIES}), retrying in {backoff:.1f}s: {e}")
+                    if streamed.task is not None:
+                        # The first command already acted on the page, so resending the
+                        # old message would run it twice; keep it and describe the page
+                        # it left behind instead
+                        command_str = await streamed.finish()
+                        if command_str is not None:
+                            session.last_command = command_str
+                            session.record_command(command_str)
+                        settle = None  # Awaited by the command before it ran
+                        user_message = await _build_step_message(
+                            session, page, goal_header, "Continue towards the final goal"
+                        )
+                    await asyncio.sleep(backoff)
                     continue
+                logger.debug(f"LLM Response: {response}")
+            
+                # Let the page finish settling before acting on it again
+                if settle is not None:
+                    await settle
+                    settle = None
+            
+                # Parse and execute based on mode
+                if session.use_javascript:
+                    # JavaScript execution mode
+                    commands, next_command, is_completed = ResponseParser.parse_javascript_response(
+                        response, config.MAX_BATCHED_COMMANDS
+                    )
                 
-                # Execute JavaScript command
-                command_str = json.dumps(command_dict)
-                session.last_command = command_str
-                logger.info(f"Executing JavaScript command: {command_str}")
+                    if not commands and not is_completed:
+                        logger.warning("No valid JSON command extracted from LLM response")
+                        session.retry_count += 1
+                        user_message = "No valid JSON command was generated. Please provide a valid JSON command in the format specified."
+                        continue
                 
-                success = await JavaScriptCommandExecutor.execute_command(page, command_dict, session)
+                    # Execute JavaScript commands in order; a failure abandons the rest of the batch
+                    if streamed.task is not None:
+                        # The first command already started while the response streamed
+                        groups = [[commands[0]]] + JavaScriptCommandExecutor.group_commands(commands[1:])
+                    else:
+                        groups = JavaScriptCommandExecutor.group_commands(commands)
                 
-                if not success:
-                    raise Exception(f"JavaScript command execution failed: {command_dict.get('action')}")
+                    for i, group in enumerate(groups):
+                        # Serialized once (compact) for the log, the retry prompt and the history
+                        command_strs = [orjson.dumps(command_dict).decode() for command_dict in group]
+                        if logger.isEnabledFor(logging.INFO):
+                            for command_str in command_strs:
+                                logger.info(f"Executing JavaScript command: {command_str}")
+                    
+                        if i == 0 and streamed.task is not None:
+                            results = [await streamed.task]
+                        else:
+                            results = await asyncio.gather(*(
+                                JavaScriptCommandExecutor.execute_command(page, command_dict, session)
+                                for command_dict in group
+                            ))
+                    
+                        for command_dict, command_str, success in zip(group, command_strs, results):
+                            session.last_command = command_str
+                            if not success:
+                                raise Exception(f"JavaScript command execution failed: {command_dict.get('action')}")
+                            session.record_command(command_str)
                 
-                session.commands_executed.append(command_str)
+                    if is_completed:
+                        session.action_done = True
+                        logger.info(f"Task completed for session {session_id}")
+                        break
                 
-            else:
-                # Playwright execution mode
-                command_line, next_command, is_completed = ResponseParser.parse_response(response)
+                else:
+                    # Playwright execution mode
+                    command_line, next_command, is_completed = ResponseParser.parse_response(response)
                 
-                if is_completed:
-                    session.action_done = True
-                    logger.info(f"Task completed for session {session_id}")
-                    break
+                    if is_completed:
+                        session.action_done = True
+                        logger.info(f"Task completed for session {session_id}")
+                        break
                 
-                if not command_line:
-                    logger.warning("No command extracted from LLM response")
-                    session.retry_count += 1
-                    user_message = "No valid command was generated. Please provide a valid Playwright command."
-                    continue
+                    if not command_line:
+                        logger.warning("No command extracted from LLM response")
+                        session.retry_count += 1
+                        user_message = "No valid command was generated. Please provide a valid Playwright command."
+                        continue
                 
-                # Execute Playwright command
-                session.last_command = command_line
-                logger.info(f"Executing Playwright command: {command_line}")
+                    # Execute Playwright command
+                    session.last_command = command_line
+                    logger.info(f"Executing Playwright command: {command_line}")
                 
-                await CommandExecutor.execute(page, command_line)
-                session.commands_executed.append(command_line)
-            
-            # Get tab information
-            tab_info = ""
-            try:
-                tabs = await TabManager.get_all_pages(session)
-                if tabs and len(tabs) > 1:
-                    tab_info = f"\n\n**Open Tabs ({len(tabs)} total)**\n"
-                    for tab in tabs:
-                        current_marker = " ← CURRENT TAB" if tab['is_current'] else ""
-                        tab_info += f"[Tab {tab['index']}] {tab['title']} - {tab['url'][:80]}{current_marker}\n"
-            except Exception as e:
-                logger.warning(f"Failed to get tab info: {e}")
+                    if streamed.task is not None:
+                        await streamed.task
+                    else:
+                        await CommandExecutor.execute(page, command_line)
+                    session.record_command(command_line)
             
-            # Get detailed page elements
-            try:
-                page_elements = await DOMInspector.get_page_elements(page)
-                session.page_snapshot = page_elements
-            except Exception as e:
-                logger.warning(f"Failed to get page elements: {e}")
-                session.page_snapshot = "Failed to extract page elements."
+                user_message = await _build_step_message(session, page, goal_header, next_command)
             
-            # Build next user message with actual page structure
-            user_message = f"**Final Goal**\n{goal}"
-            user_message += tab_info  # Add tab info if multiple tabs
-            user_message += f"\n\n**Current Page Elements**\n{session.page_snapshot[:3000]}"  # Increased limit for element list
-            user_message += f"\n\n**Next Goal**\n{next_command}"      
-            user_message += f"\n\n**Commands Executed (last 5)**\n" + "\n".join(session.commands_executed[-5:])  # Last 5 commands
+                session.retry_count = 0
             
-            session.retry_count = 0
+            except Exception as e:
+                session.retry_count += 1
+                error_msg = str(e)
+                logger.error(f"Error executing command (attempt {session.retry_count}/{config.MAX_RETRIES}): {error_msg}")
             
-        except Exception as e:
-            session.retry_count += 1
-            error_msg = str(e)
-            logger.error(f"Error executing command (attempt {session.retry_count}/{config.MAX_RETRIES}): {error_msg}")
+                if session.retry_count >= config.MAX_RETRIES and not session.closed:
+                    execution_time = time.time() - start_time
+                    return InteractResponse.model_construct(
+                        status="failure",
+                        session_id=session_id,
+                        commands_executed=list(session.commands_executed),
+                        error=f"Max retries reached. Last error: {error_msg}",
+                        code=500,
+                        execution_time_seconds=round(execution_time, 2)
+                    )
             
+                # Build retry message, which always carries the full element list
+                mode_str = "JSON command" if session.use_javascript else "Playwright command"
+                session.unchanged_snapshots = 0
+                user_message = "".join([
+                    f"The {mode_str} '{session.last_command}' failed with error: {error_msg}. Please try a different approach.",
+                    f"\n\n**Current Page Elements**\n{session.page_snapshot}",
+                    "\n\n**Commands Executed (last 5)**\n",
+                    "\n".join(session.recent_commands),
+                ])
+                # The page did not change, so re-prompt without the settle wait
+                continue
+
+            # Check if max retries reached
             if session.retry_count >= config.MAX_RETRIES:
                 execution_time = time.time() - start_time
-                return InteractResponse(
+                return InteractResponse.model_construct(
                     status="failure",
                     session_id=session_id,
-                    commands_executed=session.commands_executed,
-                    error=f"Max retries reached. Last error: {error_msg}",
+                    commands_executed=list(session.commands_executed),
+                    error="Max retries reached",
                     code=500,
                     execution_time_seconds=round(execution_time, 2)
                 )
-            
-            # Build retry message
-            mode_str = "JSON command" if session.use_javascript else "Playwright command"
-            user_message = f"The {mode_str} '{session.last_command}' failed with error: {error_msg}. Please try a different approach."
-            user_message += f"\n\n**Current Page Elements**\n{session.page_snapshot[:3000]}"
-            user_message += f"\n\n**Commands Executed (last 5)**\n" + "\n".join(session.commands_executed[-5:])
-
-        # Check if max retries reached
-        if session.retry_count >= config.MAX_RETRIES:
-            execution_time = time.time() - start_time
-            return InteractResponse(
-                status="failure",
-                session_id=session_id,
-                commands_executed=session.commands_executed,
-                error="Max retries reached",
-                code=500,
-                execution_time_seconds=round(execution_time, 2)
-            )
 
-        if session.action_done:
-            break
+            if session.action_done:
+                break
         
-        # Wait before next iteration
-        await page.wait_for_timeout(config.PAGE_WAIT_TIMEOUT)
+            # Let the requests this step started finish before the next command, overlapped
+            # with the next LLM call; PAGE_WAIT_TIMEOUT only bounds pages that never go idle
+            settle = asyncio.create_task(network.settle(page, step_mark, config.PAGE_WAIT_TIMEOUT))
+    
+    finally:
+        # Every exit leaves the last step's settle wait behind; nothing awaits it now
+        if settle is not None:
+            settle.cancel()
     
     execution_time = time.time() - start_time
+    if session.closed:
+        logger.warning(f"Session {session_id} was closed during the interaction")
+        return InteractResponse.model_construct(
+            status="failure",
+            session_id=session_id,
+            commands_executed=list(session.commands_executed),
+            error="Session was closed during the interaction",
+            code=410,
+            execution_time_seconds=round(execution_time, 2)
+        )
+    if not session.action_done:
+        # Retries ran out on a path that re-prompts without a command failure
+        return InteractResponse.model_construct(
+            status="failure",
+            session_id=session_id,
+            commands_executed=list(session.commands_executed),
+            error="Max retries reached",
+            code=500,
+            execution_time_seconds=round(execution_time, 2)
+        )
+    
     logger.info(f"Interaction completed for session {session_id} in {execution_time:.2f}s")
     
-    return InteractResponse(
+    if config.REUSE_STORAGE_STATE and session.storage_key:
+        try:
+            await storage_states.save(session.browser_context, session.storage_key, session.page.url)
+        except Exception as e:
+            logger.warning(f"Failed to save storage state: {e}")
+    
+    return InteractResponse.model_construct(
         status="success",
         session_id=session_id,
-        commands_executed=session.commands_executed,
+        commands_executed=list(session.commands_executed),
         code=200,
         execution_time_seconds=round(execution_time, 2)
     )
@@ -1730,21 +2662,21 @@ async def get_session_status(session_id: str):
     Returns:
         SessionStatusResponse with session details
     """
-    session = session_manager.get_session(session_id)
+    session = session_manager.get_session(session_id, touch=False)
     
     if not session:
-        return SessionStatusResponse(
+        return SessionStatusResponse.model_construct(
             session_id=session_id,
             exists=False,
             active=False,
             commands_executed_count=0
         )
     
-    return SessionStatusResponse(
+    return SessionStatusResponse.model_construct(
         session_id=session_id,
         exists=True,
         active=session.page is not None,
-        commands_executed_count=len(session.commands_executed),
+        commands_executed_count=session.commands_executed_total,
         created_at=session.created_at,
         last_activity=session.last_activity
     )
@@ -1761,7 +2693,7 @@ async def close_session(session_id: str):
     Returns:
         Success message
     """
-    session = session_manager.get_session(session_id)
+    session = session_manager.get_session(session_id, touch=False)
     
     if not session:
         raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
@@ -1790,7 +2722,7 @@ async def list_sessions():
         sessions_info.append({
             "session_id": session_id,
             "active": session.page is not None,
-            "commands_executed": len(session.commands_executed),
+            "commands_executed": session.commands_executed_total,
             "created_at": session.created_at.isoformat(),
             "last_activity": session.last_activity.isoformat()
         })
@@ -1818,14 +2750,16 @@ async def health_check():
 
 
 if __name__ == "__main__":
-    # Ensure logs directory exists
-    import os
-    os.makedirs('logs', exist_ok=True)
-    
     logger.info(f"Starting server on {config.HOST}:{config.PORT}")
     uvicorn.run(
         app, 
         host=config.HOST, 
         port=config.PORT,
-        log_level="info"
+        log_level="info",
+        # uvloop/httptools ship with uvicorn[standard]; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        access_log=False,
+        timeout_keep_alive=75,  # Clients polling a session reuse their connection between calls
+        workers=1  # Sessions and the browser live in this process
     )
@@ -10,17 +10,17 @@ def run(playwright: Playwright):
         print(page.accessibility.snapshot())
         # page.locator("text=Sign in").click()
         # page.get_by_label('Phone, email, or username').fill('aakarmutha')
-        # page.wait_for_timeout(2000)
+        # page.locator('button:has-text("Next")').wait_for(state="visible", timeout=5000)
         # page.locator('button:has-text("Next")').click()
-        # page.wait_for_timeout(2000)
+        # page.locator('input[name="password"]').wait_for(state="visible", timeout=5000)
         # page.locator('input[name="password"]').fill('a 303jan00')
         # page.locator('button:has-text("Log in")').click()
-        # page.wait_for_timeout(2000)
+        # page.locator('input[placeholder="Search"]').wait_for(state="visible", timeout=5000)
         # page.locator('input[placeholder="Search"]').fill('crustdata')
         # page.keyboard.press('Enter')
-        # page.wait_for_timeout(4000)
+        # page.get_by_role('article').first.wait_for(timeout=8000)
         # page.get_by_role('article').first.click()
-        # page.wait_for_timeout(2000)
+        # page.wait_for_load_state("domcontentloaded")
 
         
 
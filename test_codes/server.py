@@ -3,8 +3,23 @@ from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright
 import uvicorn
 import llmGoogle
+import orjson
+import sys
 import uuid
-from typing import Dict
+from collections import deque
+from typing import Awaitable, Callable, Dict
+
+# Fixed per session, so the LLM can send it once as its system prompt
+SYSTEM_PROMPT = """
+**Command Rules**
+1. Generate ONLY ONE action as a single-line JSON object, e.g.
+   {"op": "fill", "role": "textbox", "name": "Username", "value": "student"}
+2. "op" is one of: goto (url), click, fill (value), press (key), wait_for, wait_for_load_state (state)
+3. Target elements with "role" + "name", "label", "text" or a CSS "selector"
+4. Use explicit timeouts (5000ms minimum)
+5. Prioritize data-testid selectors
+6. Include necessary waits
+"""
 
 # Session state management
 class SessionManager:
@@ -15,9 +30,11 @@ class SessionManager:
         session_id = str(uuid.uuid4())
         self.sessions[session_id] = {
             "page": None,
-            "commands_executed": [],
+            "commands_executed": deque(maxlen=20),  # Only recent commands are ever shown
+            "command_count": 0,
             "retry_count": 0,
-            "page_content": ""
+            "page_content": "",
+            "llm": llmGoogle.llm(SYSTEM_PROMPT)  # Keeps this session's conversation history
         }
         return session_id
     
@@ -32,17 +49,38 @@ class SessionManager:
 
 session_manager = SessionManager()
 
+def _locate(page, action: dict):
+    """Resolve the element an action targets."""
+    if "role" in action:
+        locator = page.get_by_role(action["role"], name=action.get("name"))
+    elif "label" in action:
+        locator = page.get_by_label(action["label"])
+    elif "text" in action:
+        locator = page.get_by_text(action["text"])
+    else:
+        locator = page.locator(action["selector"])
+    return locator.first
+
+# Pre-bound Playwright calls the LLM can request by name
+ACTIONS: Dict[str, Callable[..., Awaitable]] = {
+    "goto": lambda page, a: page.goto(a["url"]),
+    "click": lambda page, a: _locate(page, a).click(timeout=a.get("timeout", 5000)),
+    "fill": lambda page, a: _locate(page, a).fill(a["value"], timeout=a.get("timeout", 5000)),
+    "press": lambda page, a: page.keyboard.press(a["key"]),
+    "wait_for": lambda page, a: _locate(page, a).wait_for(timeout=a.get("timeout", 5000)),
+    "wait_for_load_state": lambda page, a: page.wait_for_load_state(a.get("state", "load")),
+}
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global _browser, _llm
+    global _browser
     async with async_playwright() as playwright:
         _browser = await playwright.chromium.launch(headless=False)
-        _llm = llmGoogle.llm()
         yield
         await _browser.close()
 
 app = FastAPI(lifespan=lifespan)
-_browser, _llm = None, None
+_browser = None
 
 @app.post("/start_session")
 async def start_session():
@@ -58,43 +96,41 @@ async def interact_command(session_id: str, command: dict):
     session = session_manager.sessions[session_id]
     page = await session_manager.get_page(session_id, _browser)
     
-    # Update page content
-    session["page_content"] = await page.content()
+    # Collapse and truncate in the page so only the 2000 characters we keep cross CDP
+    session["page_content"] = await page.evaluate(
+        "() => document.body.innerText.replace(/\\s+/g, ' ').slice(0, 2000)"
+    )
     
-    system_prompt = f"""
+    user_prompt = f"""
     **Session Context**
-    Previous Commands: {session['commands_executed'][-3:]}
-    Current Page Content: {session['page_content'][:2000]}...
+    Previous Commands: {list(session['commands_executed'])[-3:]}
+    Current Page Content: {session['page_content']}...
     Errors Encountered: {session.get('last_error', 'None')}
     
-    **Command Rules**
-    1. Generate ONLY ONE Playwright command
-    2. Handle element existence checks inline
-    3. Use explicit timeouts (5000ms minimum)
-    4. Prioritize data-testid selectors
-    5. Include necessary waits
+    **Task**
+    {command.get("message", "")}
     """
     
-    response = _llm.generate_response(
-        system_prompt, 
-        command.get("message", "")
-    )
+    response = await session["llm"].generate_response(user_prompt)
     
     try:
         command_line = next(line.strip() for line in response.split("\n") if line.strip())
-        if "await" in command_line:
-            command_line = command_line.replace("await", "").strip()
+        action = orjson.loads(command_line)
         
-        # Safe execution with context
-        exec_globals = {"page": page}
-        await eval(command_line, exec_globals)
+        # Only whitelisted, pre-bound calls can run
+        handler = ACTIONS.get(action.get("op"))
+        if handler is None:
+            raise ValueError(f"Unknown op: {action.get('op')}")
+        await handler(page, action)
         
         session["commands_executed"].append(command_line)
+        session["command_count"] += 1
         session["retry_count"] = 0
+        session.pop("last_error", None)
         return {
             "status": "continue",
             "command": command_line,
-            "remaining_steps": len(session["commands_executed"]) % 3  # Example condition
+            "remaining_steps": session["command_count"] % 3  # Example condition
         }
     
     except Exception as e:
@@ -123,4 +159,12 @@ async def end_session(session_id: str):
     return {"status": "session closed"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        access_log=False,
+        workers=1  # _browser and sessions are per-process
+    )